@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Chia daemon stand-in for chia_stats.py --daemon: a websocket server which
+# replays a recorded stream of daemon messages to every client once it
+# registered, and the recorder of such streams.
+#
+# Record the messages of a daemon for 10 minutes:
+# ./bench/chia_daemon.py record --cert $CERT --key $KEY --seconds 600 \
+#     localhost node.events
+#
+# Replay them ten times faster, then poll the stand-in:
+# ./bench/chia_daemon.py replay --cert $CERT --key $KEY --speed 10 \
+#     bench/chia_events.jsonl
+# python3 chia_stats.py --daemon --services harvester --cert $CERT \
+#     --key $KEY 127.0.0.1
+#
+import argparse
+import base64
+import hashlib
+import json
+import os
+import socket
+import ssl
+import struct
+import sys
+import threading
+import time
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+
+
+def load_events(path):
+    """
+    [(seconds since the start, message)] of a recording, one
+    {"t": seconds, "message": {...}} JSON object per line.
+    """
+    events = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line == "" or line.startswith("#"):
+                continue
+            event = json.loads(line)
+            events.append((float(event['t']), event['message']))
+    return events
+
+
+def read_exactly(conn, size):
+    data = b""
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+
+def read_frame(conn):
+    """
+    (opcode, payload) of the next frame sent by the client, which masks
+    every frame.
+    """
+    first, second = read_exactly(conn, 2)
+    opcode = first & 0x0f
+    size = second & 0x7f
+    if size == 126:
+        size = struct.unpack("!H", read_exactly(conn, 2))[0]
+    elif size == 127:
+        size = struct.unpack("!Q", read_exactly(conn, 8))[0]
+    mask = read_exactly(conn, 4) if second & 0x80 else b"\0\0\0\0"
+    payload = read_exactly(conn, size)
+    return opcode, bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+
+
+def write_frame(conn, opcode, payload):
+    header = bytes([0x80 | opcode])
+    if len(payload) < 126:
+        header += bytes([len(payload)])
+    elif len(payload) < 2**16:
+        header += bytes([126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([127]) + struct.pack("!Q", len(payload))
+    conn.sendall(header + payload)
+
+
+def handshake(conn):
+    request = b""
+    while b"\r\n\r\n" not in request:
+        chunk = conn.recv(4096)
+        if not chunk:
+            raise ConnectionError("connection closed")
+        request += chunk
+    headers = {}
+    for line in request.decode('latin-1').split("\r\n")[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    accept = base64.b64encode(
+        hashlib.sha1((headers['sec-websocket-key'] +
+                      WEBSOCKET_GUID).encode()).digest()).decode()
+    conn.sendall(("HTTP/1.1 101 Switching Protocols\r\n"
+                  "Upgrade: websocket\r\n"
+                  "Connection: Upgrade\r\n"
+                  "Sec-WebSocket-Accept: {}\r\n\r\n").format(accept).encode())
+
+
+def serve_client(conn, events, args):
+    """
+    Wait for the client to register, then replay the events and close the
+    connection.
+    """
+    try:
+        handshake(conn)
+        while True:
+            opcode, payload = read_frame(conn)
+            if opcode == OPCODE_CLOSE:
+                return
+            if opcode == OPCODE_TEXT:
+                request = json.loads(payload)
+                if request.get('command') == 'register_service':
+                    break
+        started = time.monotonic()
+        for t, message in events:
+            delay = started + t / args.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            write_frame(conn, OPCODE_TEXT, json.dumps(message).encode())
+        write_frame(conn, OPCODE_CLOSE, struct.pack("!H", 1000))
+    except (OSError, ValueError, KeyError) as ex:
+        print("client: {}".format(ex), file=sys.stderr)
+    finally:
+        conn.close()
+
+
+def replay(args):
+    events = load_events(args.events)
+    listener = socket.create_server((args.address, args.port))
+    context = None
+    if args.cert:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(args.cert, args.key)
+    print("replaying {} events on {}:{}".format(len(events), args.address,
+                                                args.port),
+          file=sys.stderr)
+    while True:
+        conn, _ = listener.accept()
+        try:
+            if context is not None:
+                conn = context.wrap_socket(conn, server_side=True)
+        except (OSError, ssl.SSLError) as ex:
+            print("client: {}".format(ex), file=sys.stderr)
+            conn.close()
+            continue
+        threading.Thread(target=serve_client,
+                         args=(conn, events, args),
+                         daemon=True).start()
+
+
+def record(args):
+    import websocket
+    ws = websocket.create_connection("wss://{}:{}".format(
+        args.address, args.port),
+                                     sslopt={
+                                         'certfile': args.cert,
+                                         'keyfile': args.key,
+                                         'cert_reqs': ssl.CERT_NONE,
+                                         'check_hostname': False
+                                     })
+    ws.send(
+        json.dumps({
+            'command': 'register_service',
+            'ack': False,
+            'data': {
+                'service': 'wallet_ui'
+            },
+            'origin': 'chia_daemon_recorder',
+            'destination': 'daemon',
+            'request_id': os.urandom(32).hex()
+        }))
+    started = time.monotonic()
+    ws.settimeout(1)
+    with open(args.events, 'w') as f:
+        while time.monotonic() - started < args.seconds:
+            try:
+                message = json.loads(ws.recv())
+            except websocket.WebSocketTimeoutException:
+                continue
+            f.write(
+                json.dumps({
+                    't': round(time.monotonic() - started, 3),
+                    'message': message
+                }) + "\n")
+    ws.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Chia daemon websocket stand-in and recorder")
+    parser.add_argument("mode", choices=["replay", "record"])
+    parser.add_argument("--cert",
+                        help="TLS cert, the stand-in serves plain "
+                        "websockets without")
+    parser.add_argument("--key", help="TLS key")
+    parser.add_argument("--port",
+                        type=int,
+                        default=55400,
+                        help="Websocket port")
+    parser.add_argument("--speed",
+                        type=float,
+                        default=1.0,
+                        help="Replay that many times faster than recorded")
+    parser.add_argument("--seconds",
+                        type=float,
+                        default=600,
+                        help="Seconds to record")
+    parser.add_argument("address",
+                        nargs="?",
+                        default="127.0.0.1",
+                        help="Address to listen on, or of the daemon to "
+                        "record")
+    parser.add_argument("events", help="Recorded events file")
+    args = parser.parse_args()
+    if args.mode == "replay":
+        replay(args)
+    else:
+        record(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Harvester log parsing throughput of chia_stats.py: the streaming reader
+# against reading, splitting and matching every line, on a synthetic
+# debug log of the given size.
+#
+# ./bench/chia_logs.py --size 4096
+#
+import argparse
+import datetime
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..'))
+import chia_stats  # noqa: E402
+
+# one harvester line for about every 20 lines of the other services
+NOISE_LINES = [
+    "full_node chia.full_node.full_node: INFO     Added unfinished_block "
+    "9f3e1c2b7a6d5e4f3a2b1c0d9e8f7a6b, not farmed by us, SP: 12 farmer "
+    "response time: 2.1104, Pool pk xch1q9rkn7qtp5lmr8wfp9ne7r5mu, "
+    "validation time: 0.0312 seconds, cost: 0",
+    "full_node chia.full_node.full_node: INFO     ⏲️  Finished "
+    "signage point 34/64: CC: 1a2b3c4d5e6f7a8b RC: 8b7a6f5e4d3c2b1a",
+    "farmer chia.farmer.farmer: INFO     Harvester 0a1b2c3d responded to "
+    "signage point 34 in 0.4563 seconds",
+    "full_node chia.full_node.mempool_manager: WARNING  pre_validate_"
+    "spendbundle took 0.0212 seconds for xch",
+    "wallet chia.wallet.wallet_state_manager: INFO     Adding coin: "
+    "{'amount': 1750000000000, 'parent_coin_info': '0xccd5bb71183532bf'}",
+] * 4
+HARVESTER_LINE = (
+    "harvester chia.harvester.harvester: INFO     {} plots were eligible "
+    "for farming 4a1b2c3d4e... Found {} proofs. Time: {:.5f} s. Total 120 "
+    "plots")
+
+
+def write_log(path, size):
+    """
+    Write a synthetic debug log of about size bytes, return its lines.
+    """
+    ts = datetime.datetime(2021, 5, 1)
+    lines = 0
+    written = 0
+    with open(path, 'w') as f:
+        while written < size:
+            ts += datetime.timedelta(seconds=9.375)
+            prefix = ts.isoformat(timespec='milliseconds')
+            block = ["{} {}".format(prefix, line) for line in NOISE_LINES]
+            block.append("{} {}".format(
+                prefix,
+                HARVESTER_LINE.format(1 if lines % 5 == 0 else 0,
+                                      1 if lines % 997 == 0 else 0,
+                                      0.1 + lines % 7 * 0.01)))
+            text = "\n".join(block) + "\n"
+            f.write(text)
+            written += len(text.encode())
+            lines += len(block)
+    return lines
+
+
+def legacy_loglines(path, last_ts):
+    """
+    What HarvesterLogs did before: read the whole file, match every line.
+    """
+    loglines = []
+    with open(path) as f:
+        lines = f.read()
+        for line in lines.split("\n"):
+            match = re.match(chia_stats.HARVESTER_REGEX, line)
+            if match:
+                ts = datetime.datetime.fromisoformat(match[1])
+                lline = chia_stats.LogLine(match)
+                if ts > last_ts and (lline.eligible_plots > 0
+                                     or lline.proofs > 0):
+                    loglines.append(lline)
+    return loglines
+
+
+def streaming_loglines(path, last_ts, state_dir):
+    for name in os.listdir(state_dir):
+        os.remove(join(state_dir, name))
+    return chia_stats.HarvesterLogs([path], last_ts, state_dir).loglines
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the chia harvester log parsing")
+    parser.add_argument("-s",
+                        "--size",
+                        type=int,
+                        default=256,
+                        help="Size of the synthetic log in MB")
+    parser.add_argument("--no_legacy",
+                        action="store_true",
+                        help="Skip the former parser, it reads the whole "
+                        "log into memory")
+    parser.add_argument("--tmpdir",
+                        type=str,
+                        default=None,
+                        help="Where to write the synthetic log")
+    args = parser.parse_args()
+    workdir = tempfile.mkdtemp(dir=args.tmpdir)
+    try:
+        path = join(workdir, "harvester.log")
+        lines = write_log(path, args.size * 2**20)
+        size = os.path.getsize(path)
+        state_dir = join(workdir, "state")
+        os.mkdir(state_dir)
+        parsers = [('streaming', lambda last_ts: streaming_loglines(
+            path, last_ts, state_dir))]
+        if not args.no_legacy:
+            parsers.insert(0, ('legacy', lambda last_ts: legacy_loglines(
+                path, last_ts)))
+        print("{:>10} {:>10} {:>10} {:>8} {:>12} {:>8}".format(
+            "parser", "lines", "matches", "time_s", "lines/s", "MB/s"))
+        for name, parse in parsers:
+            started = time.perf_counter()
+            loglines = parse(datetime.datetime.min)
+            elapsed = time.perf_counter() - started
+            print("{:>10} {:>10} {:>10} {:>8.2f} {:>12.0f} {:>8.1f}".format(
+                name, lines, len(loglines), elapsed, lines / elapsed,
+                size / 2**20 / elapsed))
+    finally:
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Compares the per interface dict representation get_interfaces() used to
+# build with the columnar InterfaceTable: memory kept, peak memory and time
+# to build and serialize the interfaces of a synthetic device.
+#
+# ./bench/mikrotik_interfaces.py 1000 10000
+#
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..'))
+import mikrotik_stats  # noqa: E402
+
+BASIC_TAGS = {
+    'model': 'RouterOS\\ CCR1036-8G-2S+',
+    'hostname': 'bng1.example.com',
+    'location': 'DC1',
+    'contact': 'noc@example.com',
+    'serial': 'ABCDEF123456',
+}
+
+
+def synthetic_table(interfaces):
+    """Interface table as returned by fetch_table()."""
+    indexes = [str(i) for i in range(1, interfaces + 1)]
+    table = {
+        mikrotik_stats._column_label(column): {}
+        for column in mikrotik_stats.IF_STATIC_COLUMNS +
+        mikrotik_stats.IF_COLUMNS
+    }
+    for i in indexes:
+        table['ifIndex'][i] = i
+        table['ifDescr'][i] = "<pppoe-user{}>".format(i)
+        table['ifType'][i] = '23'
+        table['ifMtu'][i] = '1480'
+        table['ifSpeed'][i] = '0'
+        table['ifLastChange'][i] = str(1000 + int(i))
+        table['ifAdminStatus'][i] = '1'
+        table['ifOperStatus'][i] = '1'
+        for column in mikrotik_stats.IF_COUNTER_COLUMNS:
+            label = mikrotik_stats._column_label(column)
+            table[label][i] = str(123456789012 + int(i) * 7919)
+    return table
+
+
+def legacy_interfaces(table, basic_tags):
+    """The per interface dicts get_interfaces() built before."""
+    interfaces = []
+    for ifindex in table['ifIndex'].values():
+        iface = {
+            'tags': {
+                'ifindex': int(ifindex),
+                'description':
+                mikrotik_stats.str_escape(table['ifDescr'][ifindex]),
+                'interface_type': int(table['ifType'][ifindex]),
+                'speed': int(table['ifSpeed'][ifindex]),
+                'mtu': int(table['ifMtu'][ifindex]),
+                'uplink': mikrotik_stats.is_uplink(table['ifDescr'][ifindex])
+            },
+            'fields': {
+                name: table[column][ifindex]
+                for name, column in
+                mikrotik_stats.InterfaceTable.FIELD_COLUMNS
+            }
+        }
+        iface['tags'].update(basic_tags)
+        interfaces.append(iface)
+    return interfaces
+
+
+def run(build, table, devnull):
+    interfaces = build(table, BASIC_TAGS)
+    with contextlib.redirect_stdout(devnull):
+        mikrotik_stats.print_influx_lines({'interfaces': interfaces})
+    return interfaces
+
+
+def measure(build, table, repeat):
+    with open(os.devnull, 'w') as devnull:
+        # timed without tracemalloc, it slows the allocations down a lot
+        elapsed = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run(build, table, devnull)
+            elapsed.append(time.perf_counter() - started)
+        tracemalloc.start()
+        interfaces = build(table, BASIC_TAGS)
+        kept, _ = tracemalloc.get_traced_memory()
+        with contextlib.redirect_stdout(devnull):
+            mikrotik_stats.print_influx_lines({'interfaces': interfaces})
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        'time_s': min(elapsed),
+        'kept_mb': kept / 2**20,
+        'peak_mb': peak / 2**20,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark of the mikrotik interface representation")
+    parser.add_argument("interfaces",
+                        type=int,
+                        nargs="*",
+                        default=[1000, 10000],
+                        help="Number of interfaces of the synthetic device")
+    parser.add_argument("-r",
+                        "--repeat",
+                        type=int,
+                        default=5,
+                        help="Timed runs, the best one is reported")
+    args = parser.parse_args()
+    print("{:>10} {:>14} {:>9} {:>9} {:>9}".format(
+        "interfaces", "representation", "time_s", "kept_mb", "peak_mb"))
+    for interfaces in args.interfaces:
+        table = synthetic_table(interfaces)
+        for name, build in [('dicts', legacy_interfaces),
+                            ('columnar', mikrotik_stats.InterfaceTable)]:
+            result = measure(build, table, args.repeat)
+            print("{:>10} {:>14} {:>9.3f} {:>9.2f} {:>9.2f}".format(
+                interfaces, name, result['time_s'], result['kept_mb'],
+                result['peak_mb']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# End to end scrape benchmark of mikrotik_stats.py against simulated
+# devices (bench/snmpsim.py): requests issued, varbinds, wall time and peak
+# memory of every collector and of printing the lines.
+#
+# ./bench/mikrotik_scrape.py -i 10 1000 10000 -c 300
+# ./bench/mikrotik_scrape.py --walk rtr.walk --latency 2 --budget 30
+#
+import argparse
+import contextlib
+import os
+import sys
+import time
+import tracemalloc
+from os.path import abspath, basename, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..'))
+import mikrotik_stats  # noqa: E402
+from snmpsim import SimulatedAgent, SimulatedSession  # noqa: E402
+from snmpsim import SimulatedTimeout  # noqa: E402
+
+PHASES = ['basic', 'interfaces', 'wireless', 'env', 'print']
+
+
+def scrape(agent, args, caches, trace=False):
+    """
+    One scrape of every subsystem, returns {phase: measurements}.
+    """
+    sim = SimulatedSession(agent,
+                           use_numeric=args.numeric_oids,
+                           latency=args.latency / 1000.0,
+                           failures=args.failures,
+                           max_varbinds=args.max_varbinds)
+    sess = mikrotik_stats.ScrapeSession(sim, args.retries, SimulatedTimeout)
+    results = {}
+
+    def phase(name, collector, *collector_args):
+        requests = sim.requests
+        varbinds = sess.stats.total['varbinds']
+        if trace:
+            tracemalloc.reset_peak()
+        started = time.perf_counter()
+        ret = collector(*collector_args)
+        results[name] = {
+            'requests': sim.requests - requests,
+            'varbinds': sess.stats.total['varbinds'] - varbinds,
+            'time_s': time.perf_counter() - started,
+        }
+        if trace:
+            peak = tracemalloc.get_traced_memory()[1]
+            results[name]['peak_mb'] = peak / 2**20
+        return ret
+
+    basic = phase('basic', mikrotik_stats.get_basic_info, sess,
+                  caches['basic'])
+    interfaces = phase('interfaces', mikrotik_stats.get_interfaces, sess,
+                       basic['tags'], None, caches['interfaces'])
+    clients, ssids = phase('wireless', mikrotik_stats.get_wireless, sess,
+                           basic['tags'], caches['wireless'])
+    env = phase('env', mikrotik_stats.get_env, sess, basic['tags'],
+                caches['env'])
+    stats = {
+        'basic': [basic],
+        'interfaces': interfaces,
+        'wireless_clients': clients,
+        'wireless_basic': ssids,
+        'env': env,
+    }
+    with open(os.devnull, 'w') as devnull:
+        with contextlib.redirect_stdout(devnull):
+            phase('print', mikrotik_stats.print_influx_lines, stats)
+    return results
+
+
+def measure(agent, args):
+    """
+    Best wall times of args.repeat scrapes, and the memory peaks of one more
+    traced scrape: tracemalloc slows allocations down too much to time them.
+    """
+    caches = {subsystem: None for subsystem in mikrotik_stats.SUBSYSTEMS}
+    if args.warm:
+        # fill the metadata caches the measured scrapes use
+        caches = {subsystem: {} for subsystem in mikrotik_stats.SUBSYSTEMS}
+        scrape(agent, args, caches)
+    best = None
+    for _ in range(max(1, args.repeat)):
+        results = scrape(agent, args, caches)
+        if best is None:
+            best = results
+        for name, result in results.items():
+            best[name]['time_s'] = min(best[name]['time_s'], result['time_s'])
+    tracemalloc.start()
+    traced = scrape(agent, args, caches, trace=True)
+    tracemalloc.stop()
+    for name, result in traced.items():
+        best[name]['peak_mb'] = result['peak_mb']
+    best['total'] = {
+        'requests': sum(best[p]['requests'] for p in PHASES),
+        'varbinds': sum(best[p]['varbinds'] for p in PHASES),
+        'time_s': sum(best[p]['time_s'] for p in PHASES),
+        'peak_mb': max(best[p]['peak_mb'] for p in PHASES),
+    }
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Scrape benchmark of mikrotik_stats.py")
+    parser.add_argument("-i",
+                        "--interfaces",
+                        type=int,
+                        nargs="*",
+                        default=[10, 1000, 10000],
+                        help="Interfaces of the synthetic devices")
+    parser.add_argument("-c",
+                        "--clients",
+                        type=int,
+                        default=300,
+                        help="Wireless clients of the synthetic devices")
+    parser.add_argument("-a",
+                        "--arp",
+                        type=int,
+                        default=0,
+                        help="ARP entries of the synthetic devices besides "
+                        "the wireless clients'")
+    parser.add_argument("--walk",
+                        action="append",
+                        default=[],
+                        help="Recorded snmpwalk -On file to replay, "
+                        "instead of the synthetic devices")
+    parser.add_argument("-r",
+                        "--max_repetitions",
+                        type=int,
+                        default=mikrotik_stats.DEFAULT_MAX_REPETITIONS,
+                        help="GETBULK max-repetitions, 0 walks")
+    parser.add_argument("--columns_per_pdu",
+                        type=int,
+                        default=mikrotik_stats.DEFAULT_COLUMNS_PER_PDU,
+                        help="Table columns per GETBULK request")
+    parser.add_argument("-n",
+                        "--numeric_oids",
+                        action="store_true",
+                        help="Request numeric OIDs")
+    parser.add_argument("--warm",
+                        action="store_true",
+                        help="Measure scrapes with filled metadata caches")
+    parser.add_argument("--latency",
+                        type=float,
+                        default=0.0,
+                        help="Simulated round trip time per request in ms")
+    parser.add_argument("--failures",
+                        type=int,
+                        default=0,
+                        help="Time out every Nth request")
+    parser.add_argument("--retries",
+                        type=int,
+                        default=mikrotik_stats.DEFAULT_RETRIES,
+                        help="Retries of timed out requests")
+    parser.add_argument("--max_varbinds",
+                        type=int,
+                        default=None,
+                        help="Truncate GETBULK responses to this many "
+                        "varbinds")
+    parser.add_argument("--repeat",
+                        type=int,
+                        default=3,
+                        help="Timed scrapes per device, the best is reported")
+    parser.add_argument("--budget",
+                        type=float,
+                        default=None,
+                        help="Exit with an error when a scrape takes more "
+                        "seconds than this")
+    args = parser.parse_args()
+    mikrotik_stats.max_repetitions = args.max_repetitions
+    mikrotik_stats.columns_per_pdu = max(1, args.columns_per_pdu)
+    mikrotik_stats.numeric_oids = args.numeric_oids
+
+    if args.walk:
+        devices = [(basename(path), SimulatedAgent.load(path))
+                   for path in args.walk]
+    else:
+        devices = [("{}if_{}cl".format(interfaces, args.clients),
+                    SimulatedAgent.synthetic(interfaces,
+                                             args.clients,
+                                             arp=args.arp))
+                   for interfaces in args.interfaces]
+    over_budget = False
+    print("{:>16} {:>10} {:>8} {:>8} {:>8} {:>8}".format(
+        "device", "phase", "requests", "varbinds", "time_s", "peak_mb"))
+    for name, agent in devices:
+        results = measure(agent, args)
+        for phase in PHASES + ['total']:
+            result = results[phase]
+            print("{:>16} {:>10} {:>8} {:>8} {:>8.3f} {:>8.2f}".format(
+                name, phase, result['requests'], result['varbinds'],
+                result['time_s'], result['peak_mb']))
+        total = results['total']['time_s']
+        if args.budget is not None and total > args.budget:
+            print("{}: scrape took {:.1f}s, over the {:.1f}s budget".format(
+                name, total, args.budget), file=sys.stderr)
+            over_budget = True
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
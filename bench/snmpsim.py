@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# SNMP agent stand-in for mikrotik_stats.py: replays a recorded walk, or a
+# synthetic device, through an easysnmp like session.
+#
+# Record a device with the net-snmp tools:
+# snmpwalk -v2c -c public -On -Cc 192.168.88.1 .1.3.6.1 > rtr.walk
+#
+# Write a synthetic device with 1000 interfaces and 300 wireless clients:
+# ./bench/snmpsim.py -i 1000 -c 300 bng.walk
+#
+import argparse
+import bisect
+import re
+import sys
+import time
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..'))
+from mikrotik_stats import NUMERIC_OIDS  # noqa: E402
+
+WALK_LINE_REGEX = re.compile(r"^(\.?[\d\.]+)\s+=\s+(?:([\w\-]+):\s*)?(.*)$")
+NUMBER_REGEX = re.compile(r"-?\d+")
+# snmpwalk type names and the snmp_type easysnmp reports for them
+SNMP_TYPES = {
+    'INTEGER': 'INTEGER',
+    'STRING': 'OCTETSTR',
+    'Hex-STRING': 'OCTETSTR',
+    'OID': 'OBJECTID',
+    'Timeticks': 'TICKS',
+    'Counter32': 'COUNTER',
+    'Counter64': 'COUNTER64',
+    'Gauge32': 'GAUGE',
+    'IpAddress': 'IPADDR',
+}
+SNMP_TYPE_NAMES = {v: k for k, v in SNMP_TYPES.items()}
+OBJECT_NAMES = {oid: name for name, oid in NUMERIC_OIDS.items()}
+
+
+def oid_key(oid):
+    return tuple(int(x) for x in oid.strip(".").split("."))
+
+
+def parse_value(snmp_type, value):
+    """
+    easysnmp's decoded value of a value printed by snmpwalk.
+    """
+    value = value.strip()
+    if snmp_type == 'STRING':
+        if len(value) > 1 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        return value
+    if snmp_type == 'Hex-STRING':
+        return "".join(chr(int(x, 16)) for x in value.split())
+    if snmp_type in ('INTEGER', 'Timeticks'):
+        # enums are printed as name(1), timeticks as (100) 0:00:01.00
+        match = NUMBER_REGEX.search(value.split("(")[-1])
+        return match.group(0) if match else value
+    return value
+
+
+class SNMPVariable():
+    """
+    Varbind like easysnmp's SNMPVariable.
+    """
+    def __init__(self, oid=None, oid_index=None, value=None, snmp_type=None):
+        self.oid = oid
+        self.oid_index = oid_index
+        self.value = value
+        self.snmp_type = snmp_type
+
+
+class SimulatedTimeout(Exception):
+    pass
+
+
+class SimulatedAgent():
+    """
+    Sorted OID tree of one device, {oid tuple: (snmp_type, value)} kept as
+    two parallel lists for GETNEXT lookups.
+    """
+    def __init__(self, objects=None):
+        objects = objects or {}
+        self.keys = sorted(objects)
+        self.values = [objects[key] for key in self.keys]
+        self.index = {key: pos for pos, key in enumerate(self.keys)}
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Agent replaying a walk recorded with snmpwalk -On.
+        """
+        objects = {}
+        with open(path) as f:
+            for line in f:
+                match = WALK_LINE_REGEX.match(line.rstrip("\n"))
+                if not match:
+                    continue
+                oid, snmp_type, value = match.groups()
+                if snmp_type is None:
+                    # empty strings are printed as ""
+                    snmp_type = 'STRING'
+                objects[oid_key(oid)] = (SNMP_TYPES.get(snmp_type, snmp_type),
+                                         parse_value(snmp_type, value))
+        return cls(objects)
+
+    def dump(self, path):
+        """
+        Write the objects in the snmpwalk -On format load() reads.
+        """
+        with open(path, 'w') as f:
+            for key, (snmp_type, value) in zip(self.keys, self.values):
+                if snmp_type == 'OCTETSTR':
+                    if value.isprintable():
+                        printed = 'STRING: "{}"'.format(value)
+                    else:
+                        printed = "Hex-STRING: {}".format(" ".join(
+                            format(ord(x), '02X') for x in value))
+                else:
+                    printed = "{}: {}".format(SNMP_TYPE_NAMES[snmp_type],
+                                              value)
+                f.write(".{} = {}\n".format(".".join(map(str, key)),
+                                            printed))
+
+    @classmethod
+    def synthetic(cls, interfaces=10, clients=0, ssids=2, arp=0):
+        """
+        Agent of a made up device: a few ethernet ports, then PPPoE
+        interfaces up to the given number, wireless clients spread over
+        ssids wireless interfaces, with an ARP entry each, and arp more
+        ARP entries of wired hosts.
+        """
+        objects = {}
+
+        def put(name, index, snmp_type, value):
+            oid = "{}.{}".format(NUMERIC_OIDS[name], index)
+            objects[oid_key(oid)] = (snmp_type, str(value))
+
+        for name, snmp_type, value in [
+            ('sysDescr', 'OCTETSTR', 'RouterOS CCR1036-8G-2S+'),
+            ('sysName', 'OCTETSTR', 'sim{}'.format(interfaces)),
+            ('sysLocation', 'OCTETSTR', 'lab'),
+            ('sysContact', 'OCTETSTR', 'noc@example.com'),
+            ('sysUpTime', 'TICKS', 8640000),
+            ('mtxrSerialNumber', 'OCTETSTR', 'SIM{:05d}'.format(interfaces)),
+            ('mtxrFirmwareVersion', 'OCTETSTR', '6.49.7'),
+            ('mtxrLicVersion', 'OCTETSTR', '6.49.7'),
+            ('mtxrDHCPLeaseCount', 'GAUGE', clients),
+            ('ifNumber', 'INTEGER', interfaces),
+            ('ifTableLastChange', 'TICKS', 1200),
+        ]:
+            put(name, 0, snmp_type, value)
+        for ifindex in range(1, interfaces + 1):
+            ethernet = ifindex <= 8
+            descr = ("ether{}".format(ifindex) if ethernet else
+                     "<pppoe-user{}>".format(ifindex))
+            for name, snmp_type, value in [
+                ('ifIndex', 'INTEGER', ifindex),
+                ('ifDescr', 'OCTETSTR', descr),
+                ('ifType', 'INTEGER', 6 if ethernet else 23),
+                ('ifMtu', 'INTEGER', 1500 if ethernet else 1480),
+                ('ifSpeed', 'GAUGE', 1000000000 if ethernet else 0),
+                ('ifAdminStatus', 'INTEGER', 1),
+                ('ifOperStatus', 'INTEGER', 1 if ifindex % 10 else 2),
+                ('ifLastChange', 'TICKS', 1000 + ifindex),
+                ('ifInDiscards', 'COUNTER', ifindex % 7),
+                ('ifInErrors', 'COUNTER', 0),
+                ('ifOutDiscards', 'COUNTER', ifindex % 5),
+                ('ifOutErrors', 'COUNTER', 0),
+                ('ifHCInOctets', 'COUNTER64', 123456789012 + ifindex * 7919),
+                ('ifHCInUcastPkts', 'COUNTER64', 98765432 + ifindex * 13),
+                ('ifHCInMulticastPkts', 'COUNTER64', ifindex),
+                ('ifHCInBroadcastPkts', 'COUNTER64', ifindex * 2),
+                ('ifHCOutOctets', 'COUNTER64', 987654321 + ifindex * 104729),
+                ('ifHCOutUcastPkts', 'COUNTER64', 876543219 + ifindex * 17),
+                ('ifHCOutMulticastPkts', 'COUNTER64', ifindex * 3),
+                ('ifHCOutBroadcastPkts', 'COUNTER64', ifindex * 4),
+            ]:
+                put(name, ifindex, snmp_type, value)
+        for client in range(clients):
+            mac = [0x02, 0x00, 0x5e, client >> 16 & 0xff, client >> 8 & 0xff,
+                   client & 0xff]
+            ssid = client % ssids + 1
+            index = "{}.{}".format(".".join(map(str, mac)), ssid)
+            for name, snmp_type, value in [
+                ('mtxrWlCMRtabAddr', 'OCTETSTR', "".join(map(chr, mac))),
+                ('mtxrWlCMRtabUptime', 'TICKS', 360000 + client),
+                ('mtxrWlCMRtabTxBytes', 'COUNTER', 1000000 + client * 31),
+                ('mtxrWlCMRtabRxBytes', 'COUNTER', 2000000 + client * 37),
+                ('mtxrWlCMRtabTxPackets', 'COUNTER', 10000 + client),
+                ('mtxrWlCMRtabRxPackets', 'COUNTER', 20000 + client),
+                ('mtxrWlCMRtabTxRate', 'GAUGE', 144400000),
+                ('mtxrWlCMRtabRxRate', 'GAUGE', 72200000),
+                ('mtxrWlCMRtabTxStrength', 'INTEGER', -60 - client % 20),
+                ('mtxrWlCMRtabRxStrength', 'INTEGER', -62 - client % 20),
+                ('mtxrWlCMRtabSsid', 'OCTETSTR', "wifi{}".format(ssid)),
+            ]:
+                put(name, index, snmp_type, value)
+            put('ipNetToMediaPhysAddress',
+                "{}.10.{}.{}.{}".format(ssid, client >> 16 & 0xff,
+                                        client >> 8 & 0xff, client & 0xff),
+                'OCTETSTR', "".join(map(chr, mac)))
+        for host in range(arp):
+            put('ipNetToMediaPhysAddress',
+                "1.172.{}.{}.{}".format(host >> 16 & 0xff, host >> 8 & 0xff,
+                                        host & 0xff), 'OCTETSTR',
+                "".join(map(chr, [0x0a, 0x00, 0x5e, host >> 16 & 0xff,
+                                  host >> 8 & 0xff, host & 0xff])))
+        for ssid in range(1, ssids + 1):
+            count = len(range(ssid - 1, clients, ssids))
+            put('mtxrWlCMRegClientCount', ssid, 'GAUGE', count)
+            put('mtxrWlCMAuthClientCount', ssid, 'GAUGE', count)
+        for name, value in [('mtxrHlCpuTemperature', 480),
+                            ('mtxrHlBoardTemperature', 390),
+                            ('mtxrHlTemperature', 410),
+                            ('mtxrHlVoltage', 243), ('mtxrHlActiveFan', 1),
+                            ('mtxrHlProcessorFrequency', 1200)]:
+            put(name, 0, 'INTEGER', value)
+        for cpu in range(1, 37):
+            put('hrProcessorLoad', cpu, 'INTEGER', cpu % 30)
+        for index, descr, storage_type, size in [
+            (65536, 'main memory', '.1.3.6.1.2.1.25.2.1.2', 4194304),
+            (131072, 'system disk', '.1.3.6.1.2.1.25.2.1.4', 32768),
+        ]:
+            for name, snmp_type, value in [
+                ('hrStorageType', 'OBJECTID', storage_type),
+                ('hrStorageDescr', 'OCTETSTR', descr),
+                ('hrStorageAllocationUnits', 'INTEGER', 1024),
+                ('hrStorageSize', 'INTEGER', size),
+                ('hrStorageUsed', 'INTEGER', size // 3),
+                ('hrStorageAllocationFailures', 'COUNTER', 0),
+            ]:
+                put(name, index, snmp_type, value)
+        return cls(objects)
+
+    def get(self, key):
+        pos = self.index.get(key)
+        return None if pos is None else self.values[pos]
+
+    def next(self, key):
+        pos = bisect.bisect_right(self.keys, key)
+        if pos >= len(self.keys):
+            return None, None
+        return self.keys[pos], self.values[pos]
+
+
+class SimulatedSession():
+    """
+    easysnmp Session stand-in answering from a SimulatedAgent. Every
+    request counts as one PDU and waits latency seconds; every failures-th
+    request raises SimulatedTimeout instead. GETBULK responses are cut
+    after max_varbinds varbinds.
+    """
+    def __init__(self,
+                 agent,
+                 use_numeric=False,
+                 latency=0.0,
+                 failures=0,
+                 max_varbinds=None):
+        self.agent = agent
+        self.use_numeric = use_numeric
+        self.latency = latency
+        self.failures = failures
+        self.max_varbinds = max_varbinds
+        self.requests = 0
+
+    def _request(self):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failures and self.requests % self.failures == 0:
+            raise SimulatedTimeout()
+
+    def _key(self, oid):
+        name = oid.split("::")[-1]
+        if name[0] == "." or name[0].isdigit():
+            return oid_key(name)
+        label, _, index = name.partition(".")
+        return oid_key(NUMERIC_OIDS[label] + ("." + index if index else ""))
+
+    def _varbind(self, key, entry, missing='NOSUCHOBJECT'):
+        oid = "." + ".".join(map(str, key))
+        if entry is None:
+            return SNMPVariable(oid, '', 'NOSUCHOBJECT', missing)
+        snmp_type, value = entry
+        # easysnmp splits the last sub-identifier off numeric OIDs, and the
+        # row index off the object name of symbolic ones
+        if not self.use_numeric:
+            for depth in range(len(key) - 1, 0, -1):
+                prefix = "." + ".".join(map(str, key[:depth]))
+                if prefix in OBJECT_NAMES:
+                    return SNMPVariable(OBJECT_NAMES[prefix],
+                                        ".".join(map(str, key[depth:])),
+                                        value, snmp_type)
+        oid, _, index = oid.rpartition(".")
+        return SNMPVariable(oid, index, value, snmp_type)
+
+    def _next(self, key):
+        next_key, entry = self.agent.next(key)
+        if next_key is None:
+            return key, SNMPVariable(None, '', 'ENDOFMIBVIEW', 'ENDOFMIBVIEW')
+        return next_key, self._varbind(next_key, entry)
+
+    def get(self, oids):
+        self._request()
+        if not isinstance(oids, list):
+            key = self._key(oids)
+            return self._varbind(key, self.agent.get(key), 'NOSUCHINSTANCE')
+        return [
+            self._varbind(self._key(oid), self.agent.get(self._key(oid)),
+                          'NOSUCHINSTANCE') for oid in oids
+        ]
+
+    def get_bulk(self, oids, non_repeaters=0, max_repetitions=10):
+        self._request()
+        keys = [self._key(oid) for oid in oids]
+        varbinds = [self._next(key)[1] for key in keys[:non_repeaters]]
+        repeaters = keys[non_repeaters:]
+        for _ in range(max_repetitions):
+            for pos, key in enumerate(repeaters):
+                repeaters[pos], varbind = self._next(key)
+                varbinds.append(varbind)
+        # an agent running out of PDU space truncates the response
+        return varbinds[:self.max_varbinds]
+
+    def walk(self, oids):
+        base = self._key(oids)
+        key = base
+        varbinds = []
+        while True:
+            self._request()
+            key, entry = self.agent.next(key)
+            if key is None or key[:len(base)] != base:
+                return varbinds
+            varbinds.append(self._varbind(key, entry))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic mikrotik device as a snmpwalk file")
+    parser.add_argument("-i",
+                        "--interfaces",
+                        type=int,
+                        default=10,
+                        help="Number of interfaces")
+    parser.add_argument("-c",
+                        "--clients",
+                        type=int,
+                        default=0,
+                        help="Number of wireless clients")
+    parser.add_argument("-s",
+                        "--ssids",
+                        type=int,
+                        default=2,
+                        help="Number of wireless interfaces")
+    parser.add_argument("-a",
+                        "--arp",
+                        type=int,
+                        default=0,
+                        help="Number of ARP entries besides the clients'")
+    parser.add_argument("walk", help="Output file")
+    args = parser.parse_args()
+    SimulatedAgent.synthetic(args.interfaces, args.clients, args.ssids,
+                             args.arp).dump(args.walk)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,100 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 import argparse
+import collections
+import copy
+import gzip
+import hashlib
+import heapq
+import io
+import shlex
+import ssl
+import sys
+import tempfile
 import requests
 import urllib3
+import json
+import os
+import zlib
 from os import listdir
-from os.path import isfile, join
+from os.path import basename, dirname, isfile, join
 import re
 import datetime
+import math
+import time
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import FIRST_COMPLETED, wait
 
 urllib3.disable_warnings()
 
 SECONDS_PER_BLOCK = (24 * 3600) / 4608
+# RPC ports of the chia services
+SERVICES = {
+    8555: 'full_node',
+    8560: 'harvester',
+    9256: 'wallet',
+}
 HARVESTER_REGEX = re.compile(
     r"^([\d\-T\:\.]*)\s+harvester\s+chia.harvester.harvester:\s+"
     r"INFO\s+([\d]*) plots were eligible for farming ([a-z\d]*)"
     r".*Found ([\d]*) proofs.\s+Time: ([\d\.]*)\s+s.\s+Total\s+"
     r"([\d]*)\s+plots\s*$")
+# substring of the lines HARVESTER_REGEX can match, checked first as it is
+# much cheaper than the regex
+HARVESTER_MARKER = b" plots were eligible for farming "
+READ_CHUNK_SIZE = 4 * 2**20
 HARVESTER_LAST_TS_FILENAME = 'telegraf_harvester_last.ts'
+# per log file read offsets, keyed by device and inode so a rotated file is
+# still recognized under its new name
+HARVESTER_STATE_FILENAME = 'telegraf_harvester_state.json'
+# the first bytes of a file tell a new file reusing an inode apart
+FINGERPRINT_SIZE = 256
+# names of the log files with harvester lookups, rotated or compressed ones
+# included, found in the backfill dirs
+BACKFILL_LOG_NAMES = ('debug.log', 'harvester.log')
+GZIP_MAGIC = b"\x1f\x8b"
+# lines written at once by the backfill
+BACKFILL_BATCH = 5000
+# lookups taking longer risk missing the signage point
+SLOW_LOOKUP_SECONDS = 5
+# relative error of the lookup time quantiles
+SKETCH_ACCURACY = 0.01
+# RPCs and the log parsing running at the same time
+WORKERS = 6
+# nodes polled at the same time
+DEFAULT_WORKERS = 8
+# seconds to connect to a node and for each RPC response
+DEFAULT_TIMEOUT = 5
+# services polled on a node by default, a harvester only node just runs
+# the harvester
+DEFAULT_SERVICES = 'full_node,harvester,wallet'
+# websocket port of the chia daemon
+DEFAULT_DAEMON_PORT = 55400
+# seconds between two polls of the stats the daemon doesn't push
+DEFAULT_INTERVAL = 60
+# seconds without a message from the daemon before reconnecting, signage
+# points come about every 9 seconds
+DAEMON_IDLE_SECONDS = 120
+RECONNECT_SECONDS = 5
+
+output_lock = threading.Lock()
+# timestamps and header hashes of the recent blocks by height
+BLOCK_CACHE_FILENAME = 'telegraf_block_cache.json'
+# blocks between the two ends of the average block time
+BLOCK_TIME_SPAN = 500
+# digests of the last printed line of every plot
+PLOT_INDEX_FILENAME = 'telegraf_plot_index.json'
+# runs between two prints of all the plots
+DEFAULT_RESYNC = 60
+# size and k of the plot files by plot dir, with --plotdir
+PLOT_SCAN_FILENAME = 'telegraf_plot_scan.json'
+PLOT_K_REGEX = re.compile(r"^plot-k(\d+)-")
+# plot files modified since are stat'ed again, they may still be copied
+PLOT_SETTLE_SECONDS = 600
+# devices scanned at the same time
+SCAN_WORKERS = 32
 
 
 def str_escape(string):
@@ -31,6 +109,35 @@ def str_escape(string):
     return ret
 
 
+def temp_file_for(path):
+    """
+    (fd, path) of a new temporary file next to path, to be os.replace()d
+    onto it. Unique, so nodes sharing a dir do not write into each other's.
+    """
+    return tempfile.mkstemp(prefix="{}.".format(basename(path)),
+                            suffix=".tmp",
+                            dir=dirname(path) or ".")
+
+
+def node_cache_file(cachedir, filename, args):
+    """
+    filename in cachedir keyed by the node name or address, nodes polled
+    from one process share the --cachedir of the command line.
+    """
+    node = re.sub(r"[^\w\.\-]", "_", args.name or args.address)
+    base, ext = os.path.splitext(filename)
+    return join(cachedir, "{}_{}{}".format(base, node, ext))
+
+
+def line_prefix(measurement, extra_tags):
+    """
+    The measurement and its tags, without the separating comma when there
+    are no tags.
+    """
+    return ",".join([measurement] +
+                    [f"{k}={v}" for k, v in extra_tags.items()])
+
+
 def float_convert(f):
     if f == "null" or f is None:
         return 0.0
@@ -39,54 +146,598 @@ def float_convert(f):
 
 class LogLine():
     def __init__(self, match):
-        self.ts = datetime.datetime.fromisoformat(match[1])
+        self.ts_text = match[1]
         self.eligible_plots = int(match[2])
         self.challange = str(match[3])
         self.proofs = int(match[4])
         self.time_spent = float(match[5])
         self.total_plots = int(match[6])
 
+    @property
+    def ts(self):
+        # parsed on first use, most lines are dropped before
+        if '_ts' not in self.__dict__:
+            self._ts = datetime.datetime.fromisoformat(self.ts_text)
+        return self._ts
+
+
+# a harvester lookup of the backfill, sorts by timestamp, in seconds
+Lookup = collections.namedtuple(
+    'Lookup', 'timestamp eligible_plots proofs time_spent total_plots')
+
+
+class HarvesterLogReader():
+    """
+    Streams a log in chunks from a byte offset and yields only the complete
+    lines containing HARVESTER_MARKER, decoded. offset is advanced past the
+    last complete line read, a partly written last line is left for the
+    next run. With final, for a file no longer written to, the last line is
+    yielded even without a newline.
+    """
+    def __init__(self, f, offset=0, chunk_size=READ_CHUNK_SIZE, final=False):
+        self.f = f
+        self.offset = offset
+        self.chunk_size = chunk_size
+        self.final = final
+
+    def __iter__(self):
+        self.f.seek(self.offset)
+        pending = b""
+        while True:
+            chunk = self.f.read(self.chunk_size)
+            if not chunk:
+                if self.final and HARVESTER_MARKER in pending:
+                    self.offset += len(pending)
+                    yield pending.decode('utf-8', 'replace')
+                return
+            data = pending + chunk
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            pos = data.find(HARVESTER_MARKER, 0, end)
+            while pos >= 0:
+                start = data.rfind(b"\n", 0, pos) + 1
+                stop = data.find(b"\n", pos)
+                yield data[start:stop].decode('utf-8', 'replace')
+                pos = data.find(HARVESTER_MARKER, stop, end)
+            self.offset += end
+
+
+class QuantileSketch():
+    """
+    Streaming quantiles of non negative values, with a relative error of at
+    most accuracy. Values are counted in logarithmically spaced buckets, so
+    the memory depends on the range of the values, not on their count: a few
+    hundred buckets from milliseconds to minutes.
+    """
+    def __init__(self, accuracy=SKETCH_ACCURACY, buckets=None, zeros=0):
+        self.gamma = (1 + accuracy) / (1 - accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = buckets if buckets is not None else {}
+        self.zeros = zeros
+        self.count = zeros + sum(self.buckets.values())
+
+    def add(self, value):
+        self.count += 1
+        if value <= 0:
+            self.zeros += 1
+            return
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+
+    def quantile(self, q):
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zeros
+        if rank < seen:
+            return 0.0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma**key / (self.gamma + 1)
+        return 2 * self.gamma**max(self.buckets) / (self.gamma + 1)
+
+    def to_json(self):
+        return {'buckets': self.buckets, 'zeros': self.zeros}
+
+    @classmethod
+    def from_json(cls, saved):
+        buckets = {
+            int(key): count
+            for key, count in saved['buckets'].items()
+        }
+        return cls(buckets=buckets, zeros=saved['zeros'])
+
+
+class LookupWindow():
+    """
+    Summary of the harvester lookups of the interval starting at start, in
+    seconds since the epoch.
+    """
+    FIELDS = ['count', 'proofs', 'eligible_plots', 'total_plots', 'time_sum',
+              'time_min', 'time_max', 'slow']
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.proofs = 0
+        self.eligible_plots = 0
+        self.total_plots = 0
+        self.time_sum = 0.0
+        self.time_min = None
+        self.time_max = None
+        self.slow = 0
+        self.sketch = QuantileSketch()
+
+    def add(self, lline):
+        self.count += 1
+        self.proofs += lline.proofs
+        self.eligible_plots += lline.eligible_plots
+        self.total_plots = max(self.total_plots, lline.total_plots)
+        self.time_sum += lline.time_spent
+        if self.time_min is None or lline.time_spent < self.time_min:
+            self.time_min = lline.time_spent
+        if self.time_max is None or lline.time_spent > self.time_max:
+            self.time_max = lline.time_spent
+        if lline.time_spent > SLOW_LOOKUP_SECONDS:
+            self.slow += 1
+        self.sketch.add(lline.time_spent)
+
+    def values(self):
+        return {
+            'count': float(self.count),
+            'proofs': float(self.proofs),
+            'eligible_plots': float(self.eligible_plots),
+            'total_plots': float(self.total_plots),
+            'time_min': self.time_min,
+            'time_max': self.time_max,
+            'time_mean': self.time_sum / self.count,
+            'time_p50': self.sketch.quantile(0.5),
+            'time_p95': self.sketch.quantile(0.95),
+            'time_p99': self.sketch.quantile(0.99),
+            'slow_lookups': float(self.slow),
+        }
+
+    def to_json(self):
+        saved = {field: getattr(self, field) for field in self.FIELDS}
+        saved['start'] = self.start
+        saved['sketch'] = self.sketch.to_json()
+        return saved
+
+    @classmethod
+    def from_json(cls, saved):
+        window = cls(saved['start'])
+        for field in cls.FIELDS:
+            setattr(window, field, saved[field])
+        window.sketch = QuantileSketch.from_json(saved['sketch'])
+        return window
+
 
 class HarvesterLogs():
-    def __init__(self, harvester_logs, last_ts, logsdir):
+    """
+    Harvester lookups logged since last_ts, as loglines or, with an
+    aggregate interval in seconds, as the LookupWindow windows which ended.
+    The window still open is kept in the state file for the next run, with
+    the start of the last window printed: a lookup logged late for a window
+    already printed is dropped.
+    """
+    def __init__(self, harvester_logs, last_ts, logsdir, aggregate=0):
         self.harvester_logs = harvester_logs
         self.last_ts = last_ts
         self.loglines = []
+        self.aggregate = aggregate
+        self.windows = []
+        self.open_windows = {}
+        self.last_emitted = None
+        self.newest_ts = None
         self.logsdir = logsdir
+        self.state_file = join(logsdir, HARVESTER_STATE_FILENAME)
         self._process_logs()
 
+    def _load_state(self):
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            state['last_ts'] = datetime.datetime.fromisoformat(
+                state['last_ts'])
+            return state
+        except (OSError, ValueError, KeyError, TypeError):
+            return {'last_ts': datetime.datetime.min, 'files': {}}
+
+    def _save_state(self, state):
+        fd, tmp_file = temp_file_for(self.state_file)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(
+                {
+                    'last_ts': state['last_ts'].isoformat(),
+                    'files': state['files'],
+                    'aggregate': self.aggregate,
+                    'last_emitted': self.last_emitted,
+                    'windows': [
+                        window.to_json()
+                        for window in self.open_windows.values()
+                    ]
+                }, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _add(self, lline):
+        if not self.aggregate:
+            self.loglines.append(lline)
+            return
+        if self.newest_ts is None or lline.ts > self.newest_ts:
+            self.newest_ts = lline.ts
+        timestamp = datetime.datetime.timestamp(lline.ts)
+        start = int(timestamp // self.aggregate * self.aggregate)
+        if self.last_emitted is not None and start <= self.last_emitted:
+            return
+        if start not in self.open_windows:
+            self.open_windows[start] = LookupWindow(start)
+        self.open_windows[start].add(lline)
+
+    def _load_windows(self, state):
+        if state.get('aggregate') != self.aggregate:
+            return
+        try:
+            self.last_emitted = state.get('last_emitted')
+            if self.last_emitted is not None:
+                self.last_emitted = int(self.last_emitted)
+            for saved in state.get('windows', []):
+                window = LookupWindow.from_json(saved)
+                self.open_windows[window.start] = window
+        except (KeyError, TypeError, AttributeError, ValueError):
+            self.last_emitted = None
+            self.open_windows = {}
+
+    def _close_windows(self):
+        """
+        Move the windows which ended to windows.
+        """
+        now = time.time()
+        for start in sorted(self.open_windows):
+            if start + self.aggregate <= now:
+                self.windows.append(self.open_windows.pop(start))
+                self.last_emitted = start
+
+    def _read_log(self, harvester_log, entry, size):
+        """
+        Parse the complete lines appended to the log since the offset saved
+        in entry, and update entry. The file is read from the start again
+        when it was truncated or replaced by another one with the same
+        inode.
+        """
+        with open(harvester_log, 'rb') as f:
+            fingerprint = zlib.crc32(f.read(FINGERPRINT_SIZE))
+            offset = entry.get('offset', 0)
+            if entry.get('fingerprint') != fingerprint or size < offset:
+                offset = 0
+            reader = HarvesterLogReader(f, offset)
+            for line in reader:
+                match = HARVESTER_REGEX.match(line)
+                if match:
+                    lline = LogLine(match)
+                    if lline.eligible_plots == 0 and lline.proofs == 0:
+                        continue
+                    if lline.ts > self.last_ts:
+                        self._add(lline)
+        entry.update({
+            'path': harvester_log,
+            'offset': reader.offset,
+            'fingerprint': fingerprint
+        })
+
     def _process_logs(self):
+        state = self._load_state()
+        self.last_ts = max(self.last_ts, state['last_ts'])
+        if self.aggregate:
+            self._load_windows(state)
+        files = {}
         for harvester_log in self.harvester_logs:
-            with open(harvester_log) as f:
-                lines = f.read()
-                for line in lines.split("\n"):
-                    match = re.match(HARVESTER_REGEX, line)
-                    if match:
-                        lline = LogLine(match)
-                        if lline.ts > self.last_ts and (
-                                lline.eligible_plots > 0 or lline.proofs > 0):
-                            self.loglines.append(lline)
-        # place ts
-        sorted(self.loglines, key=lambda x: x.ts, reverse=1)
+            try:
+                stat = os.stat(harvester_log)
+            except OSError:
+                continue
+            key = "{}:{}".format(stat.st_dev, stat.st_ino)
+            entry = dict(state['files'].get(key, {}))
+            self._read_log(harvester_log, entry, stat.st_size)
+            files[key] = entry
+        self.loglines.sort(key=lambda x: x.ts)
         if len(self.loglines) > 0:
-            with open(join(self.logsdir, HARVESTER_LAST_TS_FILENAME),
-                      'w+') as f:
-                f.write(self.loglines[-1].ts.isoformat())
+            state['last_ts'] = self.loglines[-1].ts
+        if self.newest_ts is not None:
+            state['last_ts'] = self.newest_ts
+        if self.aggregate:
+            self._close_windows()
+        state['files'] = files
+        self._save_state(state)
+
+
+class BlockCache():
+    """
+    Timestamp and header hash of the blocks by height, kept in path between
+    runs so that a run only fetches the blocks added since the previous
+    one. Blocks are fetched in spans with get_block_records, or one at a
+    time without path as they would not be kept.
+    """
+    def __init__(self, e, path=None):
+        self.e = e
+        self.path = path
+        self.blocks = self._load()
+        self.lowest_used = None
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                blocks = json.load(f)['blocks']
+            return {int(height): block for height, block in blocks.items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            return {}
+
+    def save(self):
+        """
+        Write the cache without the blocks below the lowest one used in
+        this run.
+        """
+        if self.path is None:
+            return
+        if self.lowest_used is not None:
+            self.blocks = {
+                height: block
+                for height, block in self.blocks.items()
+                if height >= self.lowest_used
+            }
+        fd, tmp_file = temp_file_for(self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'blocks': self.blocks}, f)
+        os.replace(tmp_file, self.path)
+
+    def _fetch(self, start, end):
+        """
+        Cache the blocks from height start up to end, excluded, and return
+        their records.
+        """
+        records = self.e.get_data('get_block_records',
+                                  8555,
+                                  data=json.dumps({
+                                      "start": start,
+                                      "end": end
+                                  }))['block_records']
+        for record in records:
+            self.blocks[record['height']] = [
+                record['timestamp'], record['header_hash']
+            ]
+        return records
+
+    def sync(self, peak):
+        """
+        Fetch the blocks added below peak since the previous run. The cache
+        is dropped when it doesn't chain up to the peak anymore, after a
+        reorg or a long pause.
+        """
+        if self.path is None:
+            return
+        height = peak['height']
+        # blocks at and above the peak are left from a fork
+        self.blocks = {h: b for h, b in self.blocks.items() if h < height}
+        top = max(self.blocks) if self.blocks else None
+        if top is not None and top < height - 1:
+            if height - top > 2 * BLOCK_TIME_SPAN:
+                self.blocks = {}
+            else:
+                records = self._fetch(top + 1, height)
+                if (not records
+                        or records[0]['prev_hash'] != self.blocks[top][1]):
+                    self.blocks = {}
+        parent = self.blocks.get(height - 1)
+        if parent is None or parent[1] != peak['prev_hash']:
+            self.blocks = {}
+            self._fetch(max(0, height - 1 - BLOCK_TIME_SPAN), height)
+
+    def timestamp(self, height):
+        """
+        Timestamp of the block at height, None for a block without one.
+        Missing blocks are fetched down to height, at least
+        BLOCK_TIME_SPAN of them, in one span.
+        """
+        if height not in self.blocks and self.path is None:
+            self._fetch(height, height + 1)
+        elif height not in self.blocks:
+            lowest = min(self.blocks, default=height + 1)
+            start = max(0, min(height, lowest - BLOCK_TIME_SPAN))
+            self._fetch(start, max(lowest, height + 1))
+        if self.lowest_used is None or height < self.lowest_used:
+            self.lowest_used = height
+        return self.blocks[height][0]
+
+
+class PlotIndex():
+    """
+    Digest of the last printed chia_plots line of every plot by filename,
+    kept in path between runs so that only the plots added or changed since
+    are printed. All the plots are printed every resync runs.
+    """
+    def __init__(self, path, resync):
+        self.path = path
+        saved = self._load()
+        self.previous = saved.get('plots', {})
+        self.current = {}
+        runs = saved.get('runs', 0)
+        self.full = not self.previous or runs + 1 >= resync
+        self.runs = 0 if self.full else runs + 1
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if isinstance(saved, dict):
+                return saved
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def emit(self, filename, line):
+        digest = _digest(line)
+        self.current[filename] = digest
+        return self.full or self.previous.get(filename) != digest
+
+    def removed(self):
+        return [
+            filename for filename in self.previous
+            if filename not in self.current
+        ]
+
+    def save(self):
+        fd, tmp_file = temp_file_for(self.path)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'runs': self.runs, 'plots': self.current}, f)
+        os.replace(tmp_file, self.path)
+
+
+class PlotScanner():
+    """
+    Plot files of the plot dirs, listed with os.scandir instead of asking
+    the harvester. Their size, k and mtime are kept by dir in path between
+    runs: a dir is only listed again when its mtime changed or one of its
+    plots may still be copied, and then only its new and unsettled files are
+    stat'ed. Dirs on different devices are scanned in parallel. The dirs
+    which could not be read by the last scan are in failed, with the error.
+    """
+    def __init__(self, plotdirs, path=None):
+        self.plotdirs = plotdirs
+        self.path = path
+        self.failed = {}
+
+    def _load(self):
+        if self.path is None:
+            return {}
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+            if isinstance(saved, dict):
+                return saved
+        except (OSError, ValueError):
+            pass
+        return {}
+
+    def _save(self, dirs):
+        if self.path is None:
+            return
+        fd, tmp_file = temp_file_for(self.path)
+        with os.fdopen(fd, 'w') as f:
+            # much faster than json.dump() for a large index
+            f.write(json.dumps(dirs))
+        os.replace(tmp_file, self.path)
+
+    @staticmethod
+    def _settled(plot, now):
+        return now - plot[2] > PLOT_SETTLE_SECONDS
+
+    def _scan_dir(self, plotdir, entry, now):
+        """
+        Index of the plots of plotdir, {'mtime': dir mtime, 'plots':
+        {name: [size, k, mtime]}}, from entry, its index of the previous
+        run, when the dir didn't change. Raises OSError when plotdir can't be
+        read.
+        """
+        mtime = os.stat(plotdir).st_mtime_ns
+        if (entry and entry.get('mtime') == mtime and all(
+                self._settled(plot, now)
+                for plot in entry['plots'].values())):
+            return entry
+        previous = entry['plots'] if entry else {}
+        plots = {}
+        with os.scandir(plotdir) as files:
+            for f in files:
+                if not f.name.endswith('.plot'):
+                    continue
+                plot = previous.get(f.name)
+                if plot is None or not self._settled(plot, now):
+                    try:
+                        if not f.is_file():
+                            continue
+                        stat = f.stat()
+                    except OSError:
+                        continue
+                    match = PLOT_K_REGEX.match(f.name)
+                    plot = [
+                        stat.st_size,
+                        int(match[1]) if match else 0, stat.st_mtime
+                    ]
+                plots[f.name] = plot
+        return {'mtime': mtime, 'plots': plots}
+
+    def _scan_device(self, plotdirs, saved, now):
+        dirs = {}
+        for plotdir in plotdirs:
+            try:
+                dirs[plotdir] = self._scan_dir(plotdir, saved.get(plotdir),
+                                               now)
+            except OSError as ex:
+                self.failed[plotdir] = ex
+        return dirs
+
+    def scan(self):
+        """
+        {plot dir: index} of the readable plot dirs.
+        """
+        saved = self._load()
+        now = datetime.datetime.now().timestamp()
+        self.failed = {}
+        devices = {}
+        for plotdir in self.plotdirs:
+            try:
+                device = os.stat(plotdir).st_dev
+            except OSError as ex:
+                self.failed[plotdir] = ex
+                continue
+            devices.setdefault(device, []).append(plotdir)
+        dirs = {}
+        if devices:
+            with ThreadPoolExecutor(
+                    max_workers=min(SCAN_WORKERS, len(devices))) as executor:
+                for scanned in executor.map(
+                        lambda plotdirs: self._scan_device(
+                            plotdirs, saved, now), devices.values()):
+                    dirs.update(scanned)
+        if dirs.keys() != saved.keys() or any(
+                entry is not saved[plotdir]
+                for plotdir, entry in dirs.items()):
+            self._save(dirs)
+        return dirs
+
+
+def _digest(string):
+    return hashlib.blake2b(string.encode(), digest_size=8).hexdigest()
 
 
 class Endpoint():
-    def __init__(self, chiacert, chiakey, walletcert, walletkey, address,
-                 logsdir):
+    def __init__(self,
+                 chiacert,
+                 chiakey,
+                 walletcert,
+                 walletkey,
+                 address,
+                 logsdir,
+                 timeout=None):
         self.chiakey = chiakey
         self.chiacert = chiacert
         self.walletkey = walletkey
         self.walletcert = walletcert
         self.address = address
         self.logsdir = logsdir
+        self.timeout = timeout
         self.last_ts = self._get_last_ts()
+        # one keep-alive session per service, so every service costs one
+        # TLS handshake per run instead of one per call
+        self.sessions = {}
+        # responses of the run by request, identical calls are sent once
+        self.responses = {}
+        self.lock = threading.Lock()
 
     def _get_last_ts(self):
-        if isfile(join(self.logsdir, HARVESTER_LAST_TS_FILENAME)):
+        if self.logsdir and isfile(
+                join(self.logsdir, HARVESTER_LAST_TS_FILENAME)):
             with open(join(self.logsdir, HARVESTER_LAST_TS_FILENAME),
                       'r') as f:
                 try:
@@ -96,20 +747,69 @@ class Endpoint():
         else:
             return datetime.datetime.min
 
-    def get_data(self, endpoint, port, data="{}", cert_type=None):
+    def _session(self, port, cert_type):
+        with self.lock:
+            if port not in self.sessions:
+                session = requests.Session()
+                if cert_type is None:
+                    session.cert = (self.chiacert, self.chiakey)
+                elif cert_type == "wallet":
+                    session.cert = (self.walletcert, self.walletkey)
+                self.sessions[port] = session
+            return self.sessions[port]
+
+    def _post(self, endpoint, port, data, cert_type):
         url = f"https://{self.address}:{port}/{endpoint}"
-        if cert_type is None:
-            r = requests.post(url,
-                              cert=(self.chiacert, self.chiakey),
-                              data=data,
-                              verify=False)
-        elif cert_type == "wallet":
-            r = requests.post(url,
-                              cert=(self.walletcert, self.walletkey),
-                              data=data,
-                              verify=False)
+        # verify per request, REQUESTS_CA_BUNDLE would override the session
+        r = self._session(port, cert_type).post(url,
+                                                data=data,
+                                                verify=False,
+                                                timeout=self.timeout)
         return r.json()
 
+    def get_data(self, endpoint, port, data="{}", cert_type=None):
+        """
+        Response of an RPC, sent once per run: callers of an identical
+        request get the first response, waiting for it while it is in
+        flight. Thread safe.
+        """
+        key = (endpoint, port, data, cert_type)
+        with self.lock:
+            response = self.responses.get(key)
+            sender = response is None
+            if sender:
+                response = self.responses[key] = Future()
+        if sender:
+            try:
+                response.set_result(
+                    self._post(endpoint, port, data, cert_type))
+            except Exception as ex:
+                response.set_exception(ex)
+        return response.result()
+
+    def connection_stats(self):
+        """
+        Connections opened and requests sent per service so far, every
+        connection is a TLS handshake.
+        """
+        stats = {}
+        for port, session in self.sessions.items():
+            connections = 0
+            requests_sent = 0
+            for adapter in session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    connections += pools[key].num_connections
+                    requests_sent += pools[key].num_requests
+            stats[SERVICES.get(port, str(port))] = (connections,
+                                                    requests_sent)
+        return stats
+
+    def close(self):
+        for session in self.sessions.values():
+            session.close()
+        self.sessions = {}
+
     def get_harvester_logfiles(self):
         harvester_logs = [
             join(self.logsdir, f) for f in listdir(self.logsdir)
@@ -119,7 +819,26 @@ class Endpoint():
         return harvester_logs
 
 
-def plots(e, extra_tags):
+def get_plots(e):
+    return e.get_data('get_plots', 8560)
+
+
+def get_blockchain_state(e):
+    return e.get_data('get_blockchain_state', 8555)['blockchain_state']
+
+
+def get_wallet_balance(e):
+    return e.get_data('get_wallet_balance',
+                      9256,
+                      data='{"wallet_id": 1}',
+                      cert_type="wallet")['wallet_balance']
+
+
+def plots(e, extra_tags, index=None, out=None):
+    """
+    Print the plots, only the ones the PlotIndex index reports changed, and
+    their summary.
+    """
     plot_tags_escape = [
         'plot-seed', 'plot_public_key', 'pool_public_key',
         'pool_contract_puzzle_hash'
@@ -129,7 +848,7 @@ def plots(e, extra_tags):
     plot_values_escape = ['filename']
     unique_plot_size = 0.0
     unique_plot_count = 0
-    plots = e.get_data('get_plots', 8560)
+    plots = get_plots(e)
     for plot in plots['plots']:
         tags = ",".join(
             [f"{k}={v}" for k, v in plot.items() if k in plot_tags])
@@ -148,13 +867,21 @@ def plots(e, extra_tags):
             f"{k}={str_escape(v)}" for k, v in plot.items()
             if k in plot_values_escape
         ])
-        print("chia_plots,{} {}".format(tags, values))
+        line = "chia_plots,{} {}".format(tags, values)
+        if index is None or index.emit(plot['filename'], line):
+            print(line, file=out)
         unique_plot_size += plot['file_size']
         unique_plot_count += 1
-    tags = ",".join([f"{k}={v}" for k, v in extra_tags.items()])
+    if index is not None:
+        for filename in index.removed():
+            print("{} filename={}".format(
+                line_prefix('chia_plots_removed', extra_tags),
+                str_escape(filename)), file=out)
+        index.save()
     values = (f"unique_plot_count={float(unique_plot_count)},"
               f"unique_plot_size={float(unique_plot_size)}")
-    print("chia_plots_summary,{} {}".format(tags, values))
+    print("{} {}".format(line_prefix('chia_plots_summary', extra_tags),
+                         values), file=out)
     return plots
 
 
@@ -163,11 +890,8 @@ def network_info(e):
     return info['network_name'], info['network_prefix']
 
 
-def wallet_balance(e, extra_tags):
-    balance = e.get_data('get_wallet_balance',
-                         9256,
-                         data='{"wallet_id": 1}',
-                         cert_type="wallet")['wallet_balance']
+def wallet_balance(e, extra_tags, out=None):
+    balance = get_wallet_balance(e)
     balance_tags = ['wallet_id']
     balance_values = [
         'confirmed_wallet_balance', 'max_send_amount', 'pending_change',
@@ -180,50 +904,76 @@ def wallet_balance(e, extra_tags):
         tags += ",".join([f"{k}={v}" for k, v in extra_tags.items()])
     values = ",".join(
         [f"{k}={float(v)}" for k, v in balance.items() if k in balance_values])
-    print("chia_wallet,{} {}".format(tags, values))
+    print("chia_wallet,{} {}".format(tags, values), file=out)
 
 
-def estimated_time(e, plots, space, extra_tags):
-    tags = ""
-    total_plot_size = sum([x['file_size'] for x in plots['plots']])
-    info = e.get_data('get_blockchain_state', 8555)['blockchain_state']
-    if info['peak']['height'] < 600:
+def average_block_time(e, blocks):
+    """
+    Seconds per block between the last block with a timestamp below the
+    peak and the first one with a timestamp at 500, 1000... blocks before
+    it.
+    """
+    info = get_blockchain_state(e)
+    blocks.sync(info['peak'])
+    height = info['peak']['height'] - 1
+    while height >= 0 and blocks.timestamp(height) is None:
+        height -= 1
+    past_height = height - BLOCK_TIME_SPAN
+    while past_height >= 0 and blocks.timestamp(past_height) is None:
+        past_height -= BLOCK_TIME_SPAN
+    if height < 0 or past_height < 0:
         avg_block_time = SECONDS_PER_BLOCK
-    header_hash = info['peak']['prev_hash']
-    curr = None
-    past_curr = None
-    while curr is None or curr['timestamp'] is None:
-        curr = e.get_data('get_block_record',
-                          8555,
-                          data='{"header_hash": "' + header_hash +
-                          '"}')['block_record']
-        header_hash = curr['prev_hash']
-    past_curr = e.get_data('get_block_record_by_height',
-                           8555,
-                           data='{"height": ' +
-                           str(int(curr['height']) - 500) +
-                           '}')['block_record']
-    while past_curr is None or past_curr['timestamp'] is None:
-        past_curr = e.get_data('get_block_record_by_height',
-                               8555,
-                               data='{"height": ' +
-                               str(int(past_curr['height']) - 500) +
-                               '}')['block_record']
-    if curr['timestamp'] is not None and not (past_curr['timestamp'] is None):
-        avg_block_time = (curr['timestamp'] - past_curr['timestamp']) / (
-            curr['height'] - past_curr['height'])
     else:
-        avg_block_time = SECONDS_PER_BLOCK
-    if space is not None and plots is not None:
+        avg_block_time = (blocks.timestamp(height) -
+                          blocks.timestamp(past_height)) / (height -
+                                                            past_height)
+    blocks.save()
+    return avg_block_time
+
+
+def scanned_plots(dirs, extra_tags, out=None):
+    """
+    Print the plot count and size by plot dir and k, and their summary, of
+    the PlotScanner dirs. Returns the size of the plots.
+    """
+    extra = ""
+    if len(extra_tags) > 0:
+        extra = "," + ",".join([f"{k}={v}" for k, v in extra_tags.items()])
+    ksizes = {}
+    for plotdir, entry in dirs.items():
+        size = 0
+        for plot_size, k, _ in entry['plots'].values():
+            size += plot_size
+            count, ksize = ksizes.get(k, (0, 0))
+            ksizes[k] = (count + 1, ksize + plot_size)
+        print("chia_plots_dir,dir={}{} plot_count={},plot_size={}".format(
+            str_escape(plotdir), extra, float(len(entry['plots'])),
+            float(size)), file=out)
+    for k, (count, size) in sorted(ksizes.items()):
+        print("chia_plots_ksize,k={}{} plot_count={},plot_size={}".format(
+            k, extra, float(count), float(size)), file=out)
+    unique_plot_count = sum(count for count, _ in ksizes.values())
+    unique_plot_size = sum(size for _, size in ksizes.values())
+    values = (f"unique_plot_count={float(unique_plot_count)},"
+              f"unique_plot_size={float(unique_plot_size)}")
+    print("{} {}".format(line_prefix('chia_plots_summary', extra_tags),
+                         values), file=out)
+    return unique_plot_size
+
+
+def estimated_time(avg_block_time,
+                   total_plot_size,
+                   space,
+                   extra_tags,
+                   out=None):
+    if space is not None and total_plot_size is not None:
         proportion = total_plot_size / space if space else -1
         minutes = ((avg_block_time / 60) / proportion) if proportion else -1
-    if len(extra_tags) > 0:
-        tags += ",".join([f"{k}={v}" for k, v in extra_tags.items()])
-    print("chia_win,{} time_to_win={}".format(tags, minutes))
+    print("{} time_to_win={}".format(line_prefix('chia_win', extra_tags),
+                                     minutes), file=out)
 
 
-def blockchain_state(e, extra_tags):
-    info = e.get_data('get_blockchain_state', 8555)['blockchain_state']
+def blockstate_line(info, extra_tags):
     info_values = ['height', 'required_iters', 'signage_point_index', 'weight']
     values = ",".join([
         f"{k}={float(v)}" for k, v in info['peak'].items() if k in info_values
@@ -238,30 +988,484 @@ def blockchain_state(e, extra_tags):
     values += (f",sync_progress_height="
                f"{float(info['sync']['sync_progress_height'])}")
     tags = "example=tag"
-    print("chia_blockstate,{} {}".format(tags, values))
+    if 'node' in extra_tags:
+        tags += f",node={extra_tags['node']}"
+    return "chia_blockstate,{} {}".format(tags, values)
+
+
+def blockchain_state(e, extra_tags, out=None):
+    info = get_blockchain_state(e)
+    print(blockstate_line(info, extra_tags), file=out)
     return info['space'], info['difficulty']
 
 
-def logs(e, extra_tags):
+def parse_logs(e, aggregate=0):
+    harvester_logs = e.get_harvester_logfiles()
+    return HarvesterLogs(harvester_logs, e.last_ts, e.logsdir, aggregate)
+
+
+def logs(logs, extra_tags, out=None):
     harvester_values = [
         'eligible_plots', 'time_spent', 'proofs', 'total_plots'
     ]
-    harvester_logs = e.get_harvester_logfiles()
-    logs = HarvesterLogs(harvester_logs, e.last_ts, e.logsdir)
+    for window in logs.windows:
+        values = ",".join([
+            f"{k}={v}" for k, v in window.values().items()
+        ])
+        print("{} {} {}".format(
+            line_prefix('chia_harvester_window', extra_tags), values,
+            window.start * 10**9), file=out)
     for log in logs.loglines:
-        tags = ""
-        if len(extra_tags) > 0:
-            tags = ",".join([f"{k}={v}" for k, v in extra_tags.items()])
         values = ",".join([
             f"{k}={v}" for k, v in log.__dict__.items()
             if k in harvester_values
         ])
-        print("chia_harvester,{} {} {:.0f}".format(
-            tags, values,
-            datetime.datetime.timestamp(log.ts) * 10**9))
+        print("{} {} {:.0f}".format(
+            line_prefix('chia_harvester', extra_tags), values,
+            datetime.datetime.timestamp(log.ts) * 10**9), file=out)
 
 
-def main():
+def parse_log_file(path, spool_dir):
+    """
+    Write the Lookups of a plain or gzipped log, sorted by timestamp, to a
+    file in spool_dir and return its path. Run in the backfill worker
+    processes: the lookups of one log fit in memory, not those of all.
+    """
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    opener = gzip.open if compressed else open
+    lookups = []
+    with opener(path, 'rb') as f:
+        for line in HarvesterLogReader(f, final=True):
+            match = HARVESTER_REGEX.match(line)
+            if match:
+                lline = LogLine(match)
+                if lline.eligible_plots == 0 and lline.proofs == 0:
+                    continue
+                lookups.append(
+                    Lookup(datetime.datetime.timestamp(lline.ts),
+                           lline.eligible_plots, lline.proofs,
+                           lline.time_spent, lline.total_plots))
+    lookups.sort()
+    fd, spool = tempfile.mkstemp(suffix=".lookups", dir=spool_dir)
+    with os.fdopen(fd, 'w') as f:
+        for lookup in lookups:
+            f.write("{!r} {} {} {!r} {}\n".format(*lookup))
+    return spool
+
+
+def read_lookups(spool):
+    """
+    The Lookups written by parse_log_file, read as they are consumed.
+    """
+    with open(spool) as f:
+        for line in f:
+            timestamp, eligible, proofs, time_spent, total = line.split()
+            yield Lookup(float(timestamp), int(eligible), int(proofs),
+                         float(time_spent), int(total))
+
+
+def backfill_files(paths):
+    """
+    The files of paths, the dirs among them replaced by their log files,
+    largest first.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += [
+                join(path, f) for f in listdir(path)
+                if isfile(join(path, f)) and any(
+                    name in f for name in BACKFILL_LOG_NAMES)
+            ]
+        else:
+            files.append(path)
+    return sorted(files, key=os.path.getsize, reverse=True)
+
+
+def backfill_lines(lookups, extra_tags, aggregate=0):
+    """
+    chia_harvester lines, or chia_harvester_window lines with aggregate, of
+    the lookups sorted by timestamp.
+    """
+    harvester = line_prefix('chia_harvester', extra_tags)
+    harvester_window = line_prefix('chia_harvester_window', extra_tags)
+    window = None
+    for lookup in lookups:
+        if not aggregate:
+            yield ("{} eligible_plots={},proofs={},"
+                   "time_spent={},total_plots={} {:.0f}".format(
+                       harvester, lookup.eligible_plots, lookup.proofs,
+                       lookup.time_spent, lookup.total_plots,
+                       lookup.timestamp * 10**9))
+            continue
+        start = int(lookup.timestamp // aggregate * aggregate)
+        if window is not None and window.start != start:
+            yield "{} {} {}".format(
+                harvester_window, ",".join(
+                    [f"{k}={v}" for k, v in window.values().items()]),
+                window.start * 10**9)
+            window = None
+        if window is None:
+            window = LookupWindow(start)
+        window.add(lookup)
+    if window is not None:
+        yield "{} {} {}".format(
+            harvester_window,
+            ",".join([f"{k}={v}" for k, v in window.values().items()]),
+            window.start * 10**9)
+
+
+def backfill(args):
+    """
+    Print the harvester lookups of the --backfill logs with their
+    timestamps, merged in timestamp order. The files are parsed in parallel
+    by --processes processes. With an address the lines get the network
+    tags of the node, like the ones of a regular run.
+    """
+    tags = {}
+    if args.name:
+        tags['node'] = args.name
+    if args.address and 'full_node' in args.services.split(','):
+        node = argparse.Namespace(**dict(vars(args), address=args.address[0]))
+        e = Endpoint(chiacert=args.cert,
+                     chiakey=args.key,
+                     walletcert=args.walletcert,
+                     walletkey=args.walletkey,
+                     address=node.address,
+                     logsdir=None,
+                     timeout=args.timeout)
+        info = attempt(node, {}, 'full_node', network_info, e)
+        if info is not None:
+            tags['network_name'], tags['network_prefix'] = info
+        e.close()
+    files = backfill_files(args.backfill)
+    with tempfile.TemporaryDirectory(prefix="chia_backfill") as spool_dir:
+        with ProcessPoolExecutor(max_workers=args.processes) as executor:
+            spools = list(
+                executor.map(parse_log_file, files,
+                             [spool_dir] * len(files)))
+        lookups = heapq.merge(*[read_lookups(spool) for spool in spools])
+        batch = []
+        for line in backfill_lines(lookups, tags, args.aggregate):
+            batch.append(line)
+            if len(batch) >= BACKFILL_BATCH:
+                emit("\n".join(batch) + "\n")
+                batch = []
+        if batch:
+            emit("\n".join(batch) + "\n")
+
+
+def rpc_stats(e, extra_tags, out=None):
+    for service, (connections,
+                  requests_sent) in e.connection_stats().items():
+        tags = f"service={service}"
+        if len(extra_tags) > 0:
+            tags += ","
+            tags += ",".join([f"{k}={v}" for k, v in extra_tags.items()])
+        print("chia_rpc,{} connections={},requests={}".format(
+            tags, float(connections), float(requests_sent)), file=out)
+
+
+def node_status(status, extra_tags, out=None):
+    values = ",".join(
+        [f"{service}=\"{value}\"" for service, value in status.items()])
+    values += ",completed={},failed={}".format(
+        float(sum(value == 'ok' for value in status.values())),
+        float(sum(value == 'error' for value in status.values())))
+    print("{} {}".format(line_prefix('chia_status', extra_tags), values),
+          file=out)
+
+
+def attempt(args, status, service, collector, *collector_args):
+    """
+    Run collector, returns what it returns or None when it failed, which is
+    recorded as the status of service and reported on stderr.
+    """
+    try:
+        ret = collector(*collector_args)
+        status.setdefault(service, 'ok')
+        return ret
+    except (requests.RequestException, OSError, ValueError, KeyError,
+            TypeError) as ex:
+        status[service] = 'error'
+        print("{}: {}: {}".format(args.name or args.address, service, ex),
+              file=sys.stderr)
+        return None
+
+
+def collect(args, push=False):
+    """
+    The lines of one node, as a string. A failing service is reported in
+    chia_status, the other ones are still collected. With push, the
+    blockchain state pushed by the daemon is not printed.
+    """
+    out = io.StringIO()
+    services = args.services.split(',')
+    e = Endpoint(chiacert=args.cert,
+                 chiakey=args.key,
+                 walletcert=args.walletcert,
+                 walletkey=args.walletkey,
+                 address=args.address,
+                 logsdir=args.logsdir,
+                 timeout=args.timeout)
+    cachedir = args.cachedir or args.logsdir
+    blocks = BlockCache(
+        e,
+        node_cache_file(cachedir, BLOCK_CACHE_FILENAME, args)
+        if cachedir else None)
+    index = None
+    if cachedir and args.resync > 0 and not args.plotdir:
+        index = PlotIndex(
+            node_cache_file(cachedir, PLOT_INDEX_FILENAME, args),
+            args.resync)
+    tags = {}
+    if args.name:
+        tags['node'] = args.name
+    status = {}
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        # the independent RPCs and the log parsing run at once, the
+        # collectors below get the responses from the endpoint and print
+        # in order
+        fetches = []
+        if 'full_node' in services:
+            fetches += [network_info, get_blockchain_state]
+            block_time = executor.submit(average_block_time, e, blocks)
+        if 'wallet' in services:
+            fetches.append(get_wallet_balance)
+        if args.plotdir:
+            scanner = PlotScanner(
+                args.plotdir,
+                node_cache_file(cachedir, PLOT_SCAN_FILENAME, args)
+                if cachedir else None)
+            scan = executor.submit(scanner.scan)
+        elif 'harvester' in services:
+            fetches.append(get_plots)
+        for fetch in fetches:
+            executor.submit(fetch, e)
+        if args.logsdir:
+            harvester_logs = executor.submit(parse_logs, e, args.aggregate)
+        space = None
+        if 'full_node' in services:
+            info = attempt(args, status, 'full_node', network_info, e)
+            if info is not None:
+                tags['network_name'], tags['network_prefix'] = info
+            if push:
+                state = attempt(args, status, 'full_node',
+                                get_blockchain_state, e)
+                if state is not None:
+                    space = state['space']
+            else:
+                state = attempt(args, status, 'full_node', blockchain_state,
+                                e, tags, out)
+                if state is not None:
+                    space, difficulty = state
+            # tags['network_space'] = space
+            # tags['network_difficulty'] = difficulty
+        plot_size = None
+        if args.plotdir:
+            dirs = attempt(args, status, 'plotdir', scan.result)
+            if dirs is not None:
+                plot_size = scanned_plots(dirs, tags, out)
+            # a dropped mount must not look like plots gone
+            for plotdir, ex in scanner.failed.items():
+                status['plotdir'] = 'error'
+                print("{}: plotdir: {}".format(args.name or args.address, ex),
+                      file=sys.stderr)
+        elif 'harvester' in services:
+            plot = attempt(args, status, 'harvester', plots, e, tags, index,
+                           out)
+            if plot is not None:
+                plot_size = sum([x['file_size'] for x in plot['plots']])
+        if 'wallet' in services:
+            attempt(args, status, 'wallet', wallet_balance, e, tags, out)
+        if space is not None and plot_size is not None:
+            avg_block_time = attempt(args, status, 'full_node',
+                                     block_time.result)
+            if avg_block_time is not None:
+                estimated_time(avg_block_time, plot_size, space, tags, out)
+        if args.logsdir:
+            harvester = attempt(args, status, 'logs', harvester_logs.result)
+            if harvester is not None:
+                logs(harvester, tags, out)
+    rpc_stats(e, tags, out)
+    node_status(status, tags, out)
+    e.close()
+    return out.getvalue()
+
+
+def event_lines(message, extra_tags):
+    """
+    Influx lines of a state change pushed by the chia daemon, none for the
+    changes without stats.
+    """
+    command = message.get('command')
+    data = message.get('data') or {}
+    if command == 'get_blockchain_state' and 'blockchain_state' in data:
+        return [blockstate_line(data['blockchain_state'], extra_tags)]
+    if command == 'new_signage_point':
+        signage_point = data['signage_point']
+        sp_values = [
+            'signage_point_index', 'difficulty', 'sub_slot_iters',
+            'peak_height'
+        ]
+        values = ",".join([
+            f"{k}={float(v)}" for k, v in signage_point.items()
+            if k in sp_values
+        ])
+        values += f",proofs={float(len(data.get('proofs', [])))}"
+        return [
+            "{} {}".format(line_prefix('chia_signage_point', extra_tags),
+                           values)
+        ]
+    if command == 'new_farming_info':
+        info = data['farming_info']
+        info_values = ['passed_filter', 'proofs', 'total_plots', 'lookup_time']
+        values = ",".join(
+            [f"{k}={float(v)}" for k, v in info.items() if k in info_values])
+        return [
+            "{} {} {}".format(line_prefix('chia_farming_info', extra_tags),
+                              values,
+                              int(info['timestamp']) * 10**9)
+        ]
+    if command == 'proof':
+        return [
+            "{} proofs=1.0".format(line_prefix('chia_proof', extra_tags))
+        ]
+    return []
+
+
+def emit(lines):
+    with output_lock:
+        sys.stdout.write(lines)
+        sys.stdout.flush()
+
+
+class DaemonListener():
+    """
+    Prints the stats of the state changes the chia daemon of a node pushes
+    over its websocket as they arrive. It registers as the wallet_ui
+    service, the one the full node and the farmer send their state changes
+    to. Reconnects when the connection fails or stays idle.
+    """
+    def __init__(self, args):
+        self.args = args
+
+    def _connect(self):
+        # imported here, only the daemon mode needs websocket-client
+        import websocket
+        url = f"wss://{self.args.address}:{self.args.daemonport}"
+        ws = websocket.create_connection(url,
+                                         sslopt={
+                                             'certfile': self.args.cert,
+                                             'keyfile': self.args.key,
+                                             'cert_reqs': ssl.CERT_NONE,
+                                             'check_hostname': False
+                                         },
+                                         timeout=self.args.timeout)
+        ws.send(
+            json.dumps({
+                'command': 'register_service',
+                'ack': False,
+                'data': {
+                    'service': 'wallet_ui'
+                },
+                'origin': 'chia_stats',
+                'destination': 'daemon',
+                'request_id': os.urandom(32).hex()
+            }))
+        ws.settimeout(DAEMON_IDLE_SECONDS)
+        return ws
+
+    def _tags(self):
+        tags = {}
+        if self.args.name:
+            tags['node'] = self.args.name
+        if 'full_node' in self.args.services.split(','):
+            e = Endpoint(chiacert=self.args.cert,
+                         chiakey=self.args.key,
+                         walletcert=self.args.walletcert,
+                         walletkey=self.args.walletkey,
+                         address=self.args.address,
+                         logsdir=None,
+                         timeout=self.args.timeout)
+            info = attempt(self.args, {}, 'full_node', network_info, e)
+            if info is not None:
+                tags['network_name'], tags['network_prefix'] = info
+            e.close()
+        return tags
+
+    def _complete(self, tags):
+        """
+        Whether tags has everything _tags() can fetch, the network tags are
+        missing while the full node is down.
+        """
+        return ('full_node' not in self.args.services.split(',')
+                or 'network_name' in tags)
+
+    def run(self):
+        import websocket
+        while True:
+            try:
+                tags = self._tags()
+                fetched = time.time()
+                ws = self._connect()
+                try:
+                    while True:
+                        data = ws.recv()
+                        if not data:
+                            raise ConnectionError("closed by the daemon")
+                        if (not self._complete(tags) and
+                                time.time() - fetched >= RECONNECT_SECONDS):
+                            tags = self._tags()
+                            fetched = time.time()
+                        message = json.loads(data)
+                        lines = event_lines(message, tags)
+                        if lines:
+                            emit("\n".join(lines) + "\n")
+                finally:
+                    ws.close()
+            except (OSError, ValueError, KeyError, TypeError,
+                    websocket.WebSocketException) as ex:
+                print("{}: daemon: {}".format(
+                    self.args.name or self.args.address, ex),
+                      file=sys.stderr)
+            time.sleep(RECONNECT_SECONDS)
+
+
+def run_daemon(nodes, executor):
+    """
+    Long running mode: a DaemonListener thread per node prints the pushed
+    stats, the others are polled every --interval seconds of each node. A
+    node still being polled when its interval elapsed is polled again once
+    it finished. Never returns.
+    """
+    for node in nodes:
+        threading.Thread(target=DaemonListener(node).run,
+                         daemon=True).start()
+    next_poll = [time.time()] * len(nodes)
+    running = {}
+    while True:
+        now = time.time()
+        for pos, node in enumerate(nodes):
+            if pos not in running.values() and now >= next_poll[pos]:
+                running[executor.submit(collect, node, True)] = pos
+                next_poll[pos] = now + node.interval
+        idle = [
+            next_poll[pos] for pos in range(len(nodes))
+            if pos not in running.values()
+        ]
+        timeout = max(0, min(idle) - now) if idle else None
+        if not running:
+            time.sleep(timeout)
+            continue
+        done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            del running[future]
+            emit(future.result())
+
+
+def build_parser():
     parser = argparse.ArgumentParser(
         description="Chia stats to influx expoter")
     parser.add_argument('--cert', help="Chia cert")
@@ -269,25 +1473,119 @@ def main():
     parser.add_argument('--walletcert', help="Chia wallet cert")
     parser.add_argument('--walletkey', help="Chia wallet key")
     parser.add_argument('--logsdir', help="Chia log dir for harvester logs")
-    parser.add_argument('address', help="Ip address of the rest api")
+    parser.add_argument('--cachedir',
+                        help="Dir of the block cache, defaults to --logsdir")
+    parser.add_argument('--resync',
+                        type=int,
+                        default=DEFAULT_RESYNC,
+                        help="Print every plot every that many runs, the "
+                        "other runs only print the plots added or changed, "
+                        "0 prints them all every run")
+    parser.add_argument('--plotdir',
+                        action='append',
+                        help="Plot dir to scan for the plot counts and sizes "
+                        "instead of calling the harvester, can be repeated")
+    parser.add_argument('--aggregate',
+                        type=int,
+                        default=0,
+                        help="Print the harvester lookups as summaries of "
+                        "that many seconds instead of one line each")
+    parser.add_argument('--services',
+                        default=DEFAULT_SERVICES,
+                        help="Comma separated chia services of the node, "
+                        "among full_node, harvester and wallet")
+    parser.add_argument('--name',
+                        help="Node name, set as the node tag of its lines, "
+                        "defaults to the address when polling several nodes")
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=DEFAULT_TIMEOUT,
+                        help="Timeout in seconds of every RPC")
+    parser.add_argument('--nodes',
+                        help="File with one node per line, given as "
+                        "'ADDRESS [options]' with the same options as the "
+                        "command line; options not set on the line are "
+                        "inherited")
+    parser.add_argument('--daemon',
+                        action='store_true',
+                        help="Keep running, print the stats the chia daemon "
+                        "pushes over its websocket as they arrive and poll "
+                        "the others every --interval seconds")
+    parser.add_argument('--daemonport',
+                        type=int,
+                        default=DEFAULT_DAEMON_PORT,
+                        help="Websocket port of the chia daemon")
+    parser.add_argument('--interval',
+                        type=int,
+                        default=DEFAULT_INTERVAL,
+                        help="With --daemon, seconds between two polls")
+    parser.add_argument('--backfill',
+                        action='append',
+                        help="Print the harvester lookups of that log file, "
+                        "plain or gzipped, or of the debug.log* and "
+                        "*harvester.log* files of that dir instead of "
+                        "collecting, can be repeated")
+    parser.add_argument('--processes',
+                        type=int,
+                        default=os.cpu_count(),
+                        help="Processes parsing the --backfill logs")
+    parser.add_argument('--workers',
+                        type=int,
+                        default=DEFAULT_WORKERS,
+                        help="Number of nodes polled concurrently")
+    parser.add_argument('address',
+                        nargs='*',
+                        help="Ip address of the rest api")
+    return parser
+
+
+def load_nodes(parser, args):
+    node_args = []
+    for address in args.address:
+        node_args.append(
+            argparse.Namespace(**dict(vars(args), address=address)))
+    if args.nodes:
+        with open(args.nodes) as f:
+            for line in f:
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                line_args = parser.parse_args(shlex.split(line),
+                                              namespace=copy.copy(args))
+                if len(line_args.address) != 1:
+                    parser.error("{}: expected exactly one address per line, "
+                                 "got '{}'".format(args.nodes, line))
+                line_args.address = line_args.address[0]
+                node_args.append(line_args)
+    if len(node_args) == 0:
+        parser.error("no node given, pass an address or --nodes")
+    if args.nodes or len(node_args) > 1:
+        for node_arg in node_args:
+            if node_arg.name is None:
+                node_arg.name = node_arg.address
+    return node_args
+
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
-    e = Endpoint(chiacert=args.cert,
-                 chiakey=args.key,
-                 walletcert=args.walletcert,
-                 walletkey=args.walletkey,
-                 address=args.address,
-                 logsdir=args.logsdir)
-    tags = {}
-    network_name, network_prefix = network_info(e)
-    tags['network_name'] = network_name
-    tags['network_prefix'] = network_prefix
-    space, difficulty = blockchain_state(e, tags)
-    # tags['network_space'] = space
-    # tags['network_difficulty'] = difficulty
-    plot = plots(e, tags)
-    wallet_balance(e, tags)
-    estimated_time(e, plot, space, tags)
-    logs(e, tags)
+    if args.backfill:
+        backfill(args)
+        return
+    nodes = load_nodes(parser, args)
+    if args.daemon:
+        try:
+            import websocket  # noqa: F401
+        except ImportError:
+            parser.error("--daemon needs websocket-client, pip install "
+                         "websocket-client")
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        if args.daemon:
+            run_daemon(nodes, executor)
+        # a node's lines are printed together as soon as it is done
+        pending = [executor.submit(collect, node) for node in nodes]
+        for lines in as_completed(pending):
+            emit(lines.result())
 
 
 if __name__ == "__main__":
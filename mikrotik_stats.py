@@ -6,13 +6,231 @@
 #
 #
 import argparse
-from easysnmp import Session
+import copy
+import hashlib
+from array import array
+from contextlib import contextmanager
+import json
+import math
+import os
+import re
+import shlex
+import sys
+import threading
+import time
+from os.path import join
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+DEFAULT_MAX_REPETITIONS = 25
+DEFAULT_COLUMNS_PER_PDU = 8
+DEFAULT_TIMEOUT = 1
+DEFAULT_RETRIES = 3
+DEFAULT_WORKERS = 16
+DEFAULT_HEARTBEAT = 10
 uplinks = []
+max_repetitions = DEFAULT_MAX_REPETITIONS
+columns_per_pdu = DEFAULT_COLUMNS_PER_PDU
+numeric_oids = False
+emit_rates = False
 
+output_lock = threading.Lock()
 
-def is_uplink(descr):
-    global uplinks
-    if uplinks is not None and descr in uplinks:
+SUBSYSTEMS = ['basic', 'interfaces', 'wireless', 'env']
+# part of its interval a subsystem may be triggered early, to absorb the
+# jitter of the scrape trigger
+SCHEDULE_SLACK = 0.1
+# subsystem cache entries kept over a new cache epoch: the counter samples
+# of the rates, the ARP index (checked row by row before use) and the
+# digests of the last printed lines
+EPOCH_KEPT_KEYS = ['rates', 'arp', 'arp_ts', 'arp_missing', 'changes']
+# seconds before the cached ARP table is walked again for a MAC not in it
+ARP_REFRESH = 60
+# seconds before it is walked again for a MAC already missing from the last
+# walk, wireless clients without an IP are never in it
+ARP_MISSING_REFRESH = 600
+
+COUNTER32 = 2**32
+COUNTER64 = 2**64
+# marks a missing value in the counter arrays of InterfaceTable
+MISSING_COUNTER = COUNTER64 - 1
+NAN = float('nan')
+# first space not escaped, between the tags and the fields of a line
+FIELDS_SEPARATOR_REGEX = re.compile(r"(?<!\\) ")
+FIELD_NAME_REGEX = re.compile(r"(?:^|,)(\w+)=")
+
+END_OF_COLUMN_TYPES = ('ENDOFMIBVIEW', 'NOSUCHOBJECT', 'NOSUCHINSTANCE')
+# Numeric OIDs of every object polled, as printed by
+# `snmptranslate -On MIB::name`, used by --numeric_oids so no MIB file has to
+# be loaded or searched.
+NUMERIC_OIDS = {
+    'sysDescr': '.1.3.6.1.2.1.1.1',
+    'sysUpTime': '.1.3.6.1.2.1.1.3',
+    'sysContact': '.1.3.6.1.2.1.1.4',
+    'sysName': '.1.3.6.1.2.1.1.5',
+    'sysLocation': '.1.3.6.1.2.1.1.6',
+    'ifNumber': '.1.3.6.1.2.1.2.1',
+    'ifIndex': '.1.3.6.1.2.1.2.2.1.1',
+    'ifDescr': '.1.3.6.1.2.1.2.2.1.2',
+    'ifType': '.1.3.6.1.2.1.2.2.1.3',
+    'ifMtu': '.1.3.6.1.2.1.2.2.1.4',
+    'ifSpeed': '.1.3.6.1.2.1.2.2.1.5',
+    'ifAdminStatus': '.1.3.6.1.2.1.2.2.1.7',
+    'ifOperStatus': '.1.3.6.1.2.1.2.2.1.8',
+    'ifLastChange': '.1.3.6.1.2.1.2.2.1.9',
+    'ifInDiscards': '.1.3.6.1.2.1.2.2.1.13',
+    'ifInErrors': '.1.3.6.1.2.1.2.2.1.14',
+    'ifOutDiscards': '.1.3.6.1.2.1.2.2.1.19',
+    'ifOutErrors': '.1.3.6.1.2.1.2.2.1.20',
+    'ipNetToMediaPhysAddress': '.1.3.6.1.2.1.4.22.1.2',
+    'hrStorageType': '.1.3.6.1.2.1.25.2.3.1.2',
+    'hrStorageDescr': '.1.3.6.1.2.1.25.2.3.1.3',
+    'hrStorageAllocationUnits': '.1.3.6.1.2.1.25.2.3.1.4',
+    'hrStorageSize': '.1.3.6.1.2.1.25.2.3.1.5',
+    'hrStorageUsed': '.1.3.6.1.2.1.25.2.3.1.6',
+    'hrStorageAllocationFailures': '.1.3.6.1.2.1.25.2.3.1.7',
+    'hrProcessorLoad': '.1.3.6.1.2.1.25.3.3.1.2',
+    'ifHCInOctets': '.1.3.6.1.2.1.31.1.1.1.6',
+    'ifHCInUcastPkts': '.1.3.6.1.2.1.31.1.1.1.7',
+    'ifHCInMulticastPkts': '.1.3.6.1.2.1.31.1.1.1.8',
+    'ifHCInBroadcastPkts': '.1.3.6.1.2.1.31.1.1.1.9',
+    'ifHCOutOctets': '.1.3.6.1.2.1.31.1.1.1.10',
+    'ifHCOutUcastPkts': '.1.3.6.1.2.1.31.1.1.1.11',
+    'ifHCOutMulticastPkts': '.1.3.6.1.2.1.31.1.1.1.12',
+    'ifHCOutBroadcastPkts': '.1.3.6.1.2.1.31.1.1.1.13',
+    'ifTableLastChange': '.1.3.6.1.2.1.31.1.5',
+    'mtxrWlCMRtabAddr': '.1.3.6.1.4.1.14988.1.1.1.5.1.1',
+    'mtxrWlCMRtabUptime': '.1.3.6.1.4.1.14988.1.1.1.5.1.3',
+    'mtxrWlCMRtabTxBytes': '.1.3.6.1.4.1.14988.1.1.1.5.1.4',
+    'mtxrWlCMRtabRxBytes': '.1.3.6.1.4.1.14988.1.1.1.5.1.5',
+    'mtxrWlCMRtabTxPackets': '.1.3.6.1.4.1.14988.1.1.1.5.1.6',
+    'mtxrWlCMRtabRxPackets': '.1.3.6.1.4.1.14988.1.1.1.5.1.7',
+    'mtxrWlCMRtabTxRate': '.1.3.6.1.4.1.14988.1.1.1.5.1.8',
+    'mtxrWlCMRtabRxRate': '.1.3.6.1.4.1.14988.1.1.1.5.1.9',
+    'mtxrWlCMRtabTxStrength': '.1.3.6.1.4.1.14988.1.1.1.5.1.10',
+    'mtxrWlCMRtabRxStrength': '.1.3.6.1.4.1.14988.1.1.1.5.1.11',
+    'mtxrWlCMRtabSsid': '.1.3.6.1.4.1.14988.1.1.1.5.1.12',
+    'mtxrWlCMRegClientCount': '.1.3.6.1.4.1.14988.1.1.1.6.1.1',
+    'mtxrWlCMAuthClientCount': '.1.3.6.1.4.1.14988.1.1.1.6.1.2',
+    'mtxrHlCpuTemperature': '.1.3.6.1.4.1.14988.1.1.3.6',
+    'mtxrHlBoardTemperature': '.1.3.6.1.4.1.14988.1.1.3.7',
+    'mtxrHlVoltage': '.1.3.6.1.4.1.14988.1.1.3.8',
+    'mtxrHlActiveFan': '.1.3.6.1.4.1.14988.1.1.3.9',
+    'mtxrHlTemperature': '.1.3.6.1.4.1.14988.1.1.3.10',
+    'mtxrHlProcessorFrequency': '.1.3.6.1.4.1.14988.1.1.3.14',
+    'mtxrLicVersion': '.1.3.6.1.4.1.14988.1.1.4.4',
+    'mtxrDHCPLeaseCount': '.1.3.6.1.4.1.14988.1.1.6.1',
+    'mtxrSerialNumber': '.1.3.6.1.4.1.14988.1.1.7.3',
+    'mtxrFirmwareVersion': '.1.3.6.1.4.1.14988.1.1.7.4',
+}
+BASIC_OIDS = [
+    'sysDescr.0',
+    'sysName.0',
+    'sysLocation.0',
+    'sysContact.0',
+    'sysUpTime.0',
+    'MIKROTIK-MIB::mtxrSerialNumber.0',
+    'MIKROTIK-MIB::mtxrFirmwareVersion.0',
+    'MIKROTIK-MIB::mtxrLicVersion.0',
+    'MIKROTIK-MIB::mtxrDHCPLeaseCount.0',
+    'IF-MIB::ifNumber.0',
+    'IF-MIB::ifTableLastChange.0',
+]
+IF_STATIC_COLUMNS = [
+    'IF-MIB::ifDescr',
+    'IF-MIB::ifType',
+    'IF-MIB::ifMtu',
+    'IF-MIB::ifSpeed',
+]
+# columns fetched for every interface to decide which ones pass the
+# interface filters
+IF_DISCOVERY_COLUMNS = [
+    'IF-MIB::ifIndex',
+    'IF-MIB::ifLastChange',
+    'IF-MIB::ifAdminStatus',
+    'IF-MIB::ifOperStatus',
+]
+IF_COUNTER_COLUMNS = [
+    'IF-MIB::ifInDiscards',
+    'IF-MIB::ifInErrors',
+    'IF-MIB::ifOutDiscards',
+    'IF-MIB::ifOutErrors',
+    'IF-MIB::ifHCInOctets',
+    'IF-MIB::ifHCInUcastPkts',
+    'IF-MIB::ifHCInMulticastPkts',
+    'IF-MIB::ifHCInBroadcastPkts',
+    'IF-MIB::ifHCOutOctets',
+    'IF-MIB::ifHCOutUcastPkts',
+    'IF-MIB::ifHCOutMulticastPkts',
+    'IF-MIB::ifHCOutBroadcastPkts',
+]
+IF_COLUMNS = IF_DISCOVERY_COLUMNS + IF_COUNTER_COLUMNS
+WIRELESS_CLIENT_COLUMNS = [
+    'MIKROTIK-MIB::mtxrWlCMRtabAddr',
+    'MIKROTIK-MIB::mtxrWlCMRtabUptime',
+    'MIKROTIK-MIB::mtxrWlCMRtabTxStrength',
+    'MIKROTIK-MIB::mtxrWlCMRtabRxStrength',
+    'MIKROTIK-MIB::mtxrWlCMRtabTxBytes',
+    'MIKROTIK-MIB::mtxrWlCMRtabRxBytes',
+    'MIKROTIK-MIB::mtxrWlCMRtabTxPackets',
+    'MIKROTIK-MIB::mtxrWlCMRtabRxPackets',
+    'MIKROTIK-MIB::mtxrWlCMRtabTxRate',
+    'MIKROTIK-MIB::mtxrWlCMRtabRxRate',
+]
+# counters turned into per second rates with --rates, and their width
+IF_RATE_COUNTERS = {
+    'ifHCInOctets': COUNTER64,
+    'ifHCInUcastPkts': COUNTER64,
+    'ifHCInMulticastPkts': COUNTER64,
+    'ifHCInBroadcastPkts': COUNTER64,
+    'ifHCOutOctets': COUNTER64,
+    'ifHCOutUcastPkts': COUNTER64,
+    'ifHCOutMulticastPkts': COUNTER64,
+    'ifHCOutBroadcastPkts': COUNTER64,
+}
+WIRELESS_RATE_COUNTERS = {
+    'mtxrWlCMRtabTxBytes': COUNTER32,
+    'mtxrWlCMRtabRxBytes': COUNTER32,
+    'mtxrWlCMRtabTxPackets': COUNTER32,
+    'mtxrWlCMRtabRxPackets': COUNTER32,
+}
+WIRELESS_SSID_NAME_COLUMNS = [
+    'MIKROTIK-MIB::mtxrWlCMRtabSsid',
+]
+WIRELESS_SSID_COLUMNS = [
+    'MIKROTIK-MIB::mtxrWlCMRegClientCount',
+    'MIKROTIK-MIB::mtxrWlCMAuthClientCount',
+]
+ARP_COLUMNS = [
+    'IP-MIB::ipNetToMediaPhysAddress',
+]
+# scalars, fetched with a single GET
+HEALTH_SCALARS = [
+    'MIKROTIK-MIB::mtxrHlCpuTemperature',
+    'MIKROTIK-MIB::mtxrHlBoardTemperature',
+    'MIKROTIK-MIB::mtxrHlTemperature',
+    'MIKROTIK-MIB::mtxrHlVoltage',
+    'MIKROTIK-MIB::mtxrHlActiveFan',
+    'MIKROTIK-MIB::mtxrHlProcessorFrequency',
+]
+HEALTH_COLUMNS = [
+    'HOST-RESOURCES-MIB::hrProcessorLoad',
+]
+STORAGE_STATIC_COLUMNS = [
+    'HOST-RESOURCES-MIB::hrStorageType',
+    'HOST-RESOURCES-MIB::hrStorageDescr',
+    'HOST-RESOURCES-MIB::hrStorageAllocationUnits',
+]
+STORAGE_COLUMNS = [
+    'HOST-RESOURCES-MIB::hrStorageSize',
+    'HOST-RESOURCES-MIB::hrStorageUsed',
+    'HOST-RESOURCES-MIB::hrStorageAllocationFailures',
+]
+
+
+def is_uplink(descr, ports=None):
+    if ports is None:
+        ports = uplinks
+    if ports is not None and descr in ports:
         return True
     return False
 
@@ -38,114 +256,569 @@ def str_escape(string):
     return ret
 
 
-def get_basic_info(sess):
+class ScrapeStats():
+    """
+    Request counters of a scrape, in total and per OID table.
+    """
+    COUNTERS = ['requests', 'varbinds', 'retries', 'timeouts', 'bytes']
+
+    def __init__(self):
+        self.total = self._counters()
+        self.tables = {}
+        self.table = None
+
+    def _counters(self):
+        counters = {counter: 0 for counter in self.COUNTERS}
+        counters['duration'] = 0.0
+        return counters
+
+    def count(self, counter, value=1):
+        self.total[counter] += value
+        if self.table is not None:
+            self.tables[self.table][counter] += value
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class ScrapeSession():
+    """
+    easysnmp session wrapper counting requests, varbinds, retries, timeouts
+    and received bytes (OIDs and values as decoded by easysnmp). It retries
+    timed out requests itself, the wrapped session is created without
+    retries. Once the deadline (a time.time() value) passed, no more
+    requests are sent and DeadlineExceeded is raised instead.
+    """
+    def __init__(self, sess, retries, timeout_error):
+        self.sess = sess
+        self.retries = retries
+        self.timeout_error = timeout_error
+        self.stats = ScrapeStats()
+        self.deadline = None
+
+    def get(self, oids):
+        return self._request(self.sess.get, oids)
+
+    def get_bulk(self, oids, non_repeaters=0, max_repetitions=10):
+        return self._request(self.sess.get_bulk,
+                             oids,
+                             non_repeaters=non_repeaters,
+                             max_repetitions=max_repetitions)
+
+    def walk(self, oids):
+        return self._request(self.sess.walk, oids)
+
+    def _request(self, method, *args, **kwargs):
+        attempt = 0
+        while True:
+            if self.deadline is not None and time.time() >= self.deadline:
+                raise DeadlineExceeded("scrape deadline exceeded")
+            self.stats.count('requests')
+            try:
+                result = method(*args, **kwargs)
+                break
+            except self.timeout_error:
+                self.stats.count('timeouts')
+                if attempt >= self.retries:
+                    raise
+                attempt += 1
+                self.stats.count('retries')
+        varbinds = result if isinstance(result, list) else [result]
+        self.stats.count('varbinds', len(varbinds))
+        self.stats.count(
+            'bytes',
+            sum(
+                len(v.oid or '') + len(v.oid_index or '') +
+                len(v.value or '') for v in varbinds))
+        return result
+
+
+@contextmanager
+def scrape_table(sess, name):
+    """
+    Account the requests done in the block to the table name, when sess
+    is a ScrapeSession.
+    """
+    stats = sess.stats if isinstance(sess, ScrapeSession) else None
+    if stats is None or name is None:
+        yield
+        return
+    stats.tables.setdefault(name, stats._counters())
+    stats.table = name
+    started = time.time()
+    try:
+        yield
+    finally:
+        stats.tables[name]['duration'] += time.time() - started
+        stats.table = None
+
+
+def _column_label(column):
+    return column.split("::")[-1].lstrip(".")
+
+
+def resolve_oid(name):
+    """
+    Return the OID to request for an object name like 'IF-MIB::ifDescr' or
+    'sysName.0': the name itself, or its numeric form with --numeric_oids.
+    """
+    if not numeric_oids:
+        return name
+    label, _, index = _column_label(name).partition(".")
+    oid = NUMERIC_OIDS[label]
+    if index:
+        oid = "{}.{}".format(oid, index)
+    return oid
+
+
+def _varbind_index(column, varbind):
+    """
+    Return the row index of a varbind within a table column, or None
+    when the varbind is already past the end of the column.
+    """
+    if varbind.snmp_type in END_OF_COLUMN_TYPES:
+        return None
+    label = _column_label(column)
+    oid = varbind.oid.lstrip(".")
+    if oid == label:
+        return varbind.oid_index
+    if varbind.oid_index:
+        oid = "{}.{}".format(oid, varbind.oid_index)
+    if oid.startswith(label + "."):
+        return oid[len(label) + 1:]
+    return None
+
+
+def _walk_columns(sess, columns):
+    table = {}
+    for column in columns:
+        rows = {}
+        oid = resolve_oid(column)
+        for varbind in sess.walk(oid):
+            index = _varbind_index(oid, varbind)
+            if index is not None:
+                rows[index] = varbind.value
+        table[_column_label(column)] = rows
+    return table
+
+
+def _bulk_columns(sess, columns):
+    table = {_column_label(column): {} for column in columns}
+    oids = {column: resolve_oid(column) for column in columns}
+    cursors = dict(oids)
+    while cursors:
+        pending = list(cursors)
+        varbinds = sess.get_bulk([cursors[column] for column in pending],
+                                 non_repeaters=0,
+                                 max_repetitions=max_repetitions)
+        finished = set()
+        advanced = False
+        for pos, varbind in enumerate(varbinds):
+            column = pending[pos % len(pending)]
+            if column in finished:
+                continue
+            index = _varbind_index(oids[column], varbind)
+            if index is None:
+                finished.add(column)
+                continue
+            table[_column_label(column)][index] = varbind.value
+            cursors[column] = "{}.{}".format(oids[column], index)
+            advanced = True
+        # columns which were not answered at all are retried in the next
+        # round, unless the agent did not return anything useful
+        if not advanced and not finished:
+            break
+        for column in finished:
+            del cursors[column]
+    return table
+
+
+def fetch_table(sess, columns, name=None):
+    """
+    Fetch whole table columns and return them as
+    {column_label: {oid_index: value}}.
+
+    Columns are fetched with GETBULK, several columns per PDU, unless
+    max_repetitions is 0, which falls back to one GETNEXT walk per column.
+    The requests are accounted to the table name in the scrape stats.
+    """
+    with scrape_table(sess, name):
+        if max_repetitions <= 0:
+            return _walk_columns(sess, columns)
+        table = {}
+        for pos in range(0, len(columns), columns_per_pdu):
+            table.update(
+                _bulk_columns(sess, columns[pos:pos + columns_per_pdu]))
+        return table
+
+
+def fetch_scalars(sess, objects, name=None):
+    """
+    Fetch scalar objects with one GET, returned like fetch_table() with
+    their instance index '0'. Objects the device does not have are empty.
+    """
+    table = {_column_label(obj): {} for obj in objects}
+    with scrape_table(sess, name):
+        values = sess.get(
+            [resolve_oid("{}.0".format(obj)) for obj in objects])
+    for obj, varbind in zip(objects, values):
+        if varbind.snmp_type not in END_OF_COLUMN_TYPES:
+            table[_column_label(obj)]['0'] = varbind.value
+    return table
+
+
+def fetch_rows(sess, columns, indexes, name=None):
+    """
+    Fetch only the given rows of table columns with GET requests of
+    max_repetitions varbinds, returned like fetch_table().
+    """
+    table = {_column_label(column): {} for column in columns}
+    varbinds = [(column, index) for index in indexes for column in columns]
+    size = max_repetitions if max_repetitions > 0 else DEFAULT_MAX_REPETITIONS
+    with scrape_table(sess, name):
+        for pos in range(0, len(varbinds), size):
+            chunk = varbinds[pos:pos + size]
+            values = sess.get([
+                "{}.{}".format(resolve_oid(column), index)
+                for column, index in chunk
+            ])
+            for (column, index), varbind in zip(chunk, values):
+                if varbind.snmp_type not in END_OF_COLUMN_TYPES:
+                    table[_column_label(column)][index] = varbind.value
+    return table
+
+
+def fetch_table_cached(sess,
+                       cache,
+                       key,
+                       static_columns,
+                       columns,
+                       change_column=None,
+                       name=None):
+    """
+    fetch_table() for tables with rarely changing static_columns, which
+    are kept in cache[key] and only fetched again when the table gained
+    rows or, if given, the value of change_column changed for any row.
+    Without a cache every column is fetched.
+    """
+    if cache is None:
+        return fetch_table(sess, static_columns + columns, name)
+    table = fetch_table(sess, columns, name)
+    indexes = set().union(*table.values())
+    entry = cache.get(key)
+    if (entry is None
+            or any(not indexes.issubset(rows)
+                   for rows in entry['static'].values())
+            or (change_column is not None
+                and entry.get('changes') != table[change_column])):
+        entry = {
+            'static':
+            fetch_table(sess, static_columns,
+                        "{}_static".format(name) if name else None)
+        }
+    if change_column is not None:
+        entry['changes'] = table[change_column]
+    cache[key] = entry
+    table.update(entry['static'])
+    return table
+
+
+def validate_cache(cache, basic):
+    """
+    Start a new cache epoch when the device rebooted (sysUpTime went
+    backwards) or its interface table changed, the metadata the other
+    subsystems cached in an older epoch is dropped. A reboot also starts a
+    new boot, which drops the counter samples kept for the rates.
+    """
+    state = {
+        'sysUpTime': parse_int(basic['sysUpTime.0']),
+        'ifNumber': basic['ifNumber.0'],
+        'ifTableLastChange': basic['ifTableLastChange.0'],
+    }
+    rebooted = cache.get('sysUpTime', -1) > state['sysUpTime']
+    if rebooted:
+        cache['boot'] = cache.get('boot', 0) + 1
+    if (rebooted
+            or cache.get('ifNumber', state['ifNumber']) != state['ifNumber']
+            or cache.get('ifTableLastChange', state['ifTableLastChange']) !=
+            state['ifTableLastChange']):
+        cache['epoch'] = cache.get('epoch', 0) + 1
+    cache.update(state)
+
+
+def counter_delta(current, previous, width):
+    """
+    Increase of a counter of the given width between two readings, taking
+    a wrap into account. Returns None when the counter was reset, which
+    shows up as a decrease too big to be a wrap.
+    """
+    delta = current - previous
+    if delta < 0:
+        delta += width
+        if delta > width // 2:
+            return None
+    return delta
+
+
+def counter_rates(cache, key, table, counters):
+    """
+    Per second rates of the counters of every row of table since the
+    previous sample kept in cache['rates'][key], which is replaced by the
+    current one. Rows without a usable previous sample are left out.
+    """
+    now = time.time()
+    state = cache.setdefault('rates', {})
+    previous = state.get(key, {'ts': now, 'rows': {}})
+    elapsed = now - previous['ts']
+    samples = {}
+    rates = {}
+    for index in table[next(iter(counters))]:
+        samples[index] = {
+            counter: parse_int(table[counter].get(index, ''))
+            for counter in counters
+        }
+        prev_sample = previous['rows'].get(index)
+        if prev_sample is None or elapsed <= 0:
+            continue
+        row = {}
+        for counter, width in counters.items():
+            if samples[index][counter] < 0 or prev_sample[counter] < 0:
+                break
+            delta = counter_delta(samples[index][counter],
+                                  prev_sample[counter], width)
+            if delta is None:
+                break
+            row[counter] = delta / elapsed
+        else:
+            rates[index] = row
+    state[key] = {'ts': now, 'rows': samples}
+    return rates
+
+
+def get_basic_info(sess, cache=None):
+    with scrape_table(sess, 'system'):
+        values = sess.get([resolve_oid(oid) for oid in BASIC_OIDS])
+    basic = {
+        _column_label(oid): varbind.value
+        for oid, varbind in zip(BASIC_OIDS, values)
+    }
     ret = {
         'tags': {
-            'model':
-            str_escape(sess.get('sysDescr.0').value),
-            'hostname':
-            str_escape(sess.get('sysName.0').value),
-            'location':
-            str_escape(sess.get('sysLocation.0').value),
-            'contact':
-            str_escape(sess.get('sysContact.0').value),
-            'serial':
-            str_escape(sess.get('MIKROTIK-MIB::mtxrSerialNumber.0').value),
+            'model': str_escape(basic['sysDescr.0']),
+            'hostname': str_escape(basic['sysName.0']),
+            'location': str_escape(basic['sysLocation.0']),
+            'contact': str_escape(basic['sysContact.0']),
+            'serial': str_escape(basic['mtxrSerialNumber.0']),
         },
         'fields': {
             'firmware_version':
-            "\"{}\"".format(
-                str_escape(
-                    sess.get('MIKROTIK-MIB::mtxrFirmwareVersion.0').value)),
+            "\"{}\"".format(str_escape(basic['mtxrFirmwareVersion.0'])),
             'version':
-            "\"{}\"".format(
-                str_escape(sess.get('MIKROTIK-MIB::mtxrLicVersion.0').value)),
-            'dhcp_leases':
-            sess.get('MIKROTIK-MIB::mtxrDHCPLeaseCount.0').value,
-            'sysUpTime':
-            sess.get('sysUpTime.0').value,
+            "\"{}\"".format(str_escape(basic['mtxrLicVersion.0'])),
+            'dhcp_leases': basic['mtxrDHCPLeaseCount.0'],
+            'sysUpTime': basic['sysUpTime.0'],
         }
     }
+    if cache is not None:
+        validate_cache(cache, basic)
     return ret
 
 
-def get_interfaces(sess, basic_tags):
-    interfaces = []
-    ifindexes = sess.walk('IF-MIB::ifIndex')
-    iftypes = {v.oid_index: v for v in sess.walk('IF-MIB::ifType')}
-    ifdescr = {v.oid_index: v for v in sess.walk('IF-MIB::ifDescr')}
-    ifmtu = {v.oid_index: v for v in sess.walk('IF-MIB::ifMtu')}
-    ifspeeds = {v.oid_index: v for v in sess.walk('IF-MIB::ifSpeed')}
-    ifadminstatus = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifAdminStatus')
-    }
-    ifoperstatus = {v.oid_index: v for v in sess.walk('IF-MIB::ifOperStatus')}
-    ifinoctets = {v.oid_index: v for v in sess.walk('IF-MIB::ifHCInOctets')}
-    ifinucastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCInUcastPkts')
-    }
-    ifinmcastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCInMulticastPkts')
-    }
-    ifinbcastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCInBroadcastPkts')
-    }
-    ifoutoctets = {v.oid_index: v for v in sess.walk('IF-MIB::ifHCOutOctets')}
-    ifoutucastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCOutUcastPkts')
-    }
-    ifoutmcastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCOutMulticastPkts')
-    }
-    ifoutbcastpkts = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifHCOutBroadcastPkts')
-    }
+class InterfaceFilter():
+    """
+    Selects interfaces by description regex, type and admin/oper status,
+    every given criterion has to match.
+    """
+    def __init__(self,
+                 include_descr=None,
+                 exclude_descr=None,
+                 include_types=None,
+                 exclude_types=None,
+                 admin_status=None,
+                 oper_status=None):
+        self.include_descr = (re.compile(include_descr)
+                              if include_descr else None)
+        self.exclude_descr = (re.compile(exclude_descr)
+                              if exclude_descr else None)
+        self.include_types = include_types
+        self.exclude_types = exclude_types
+        self.admin_status = admin_status
+        self.oper_status = oper_status
 
-    ifindiscards = {v.oid_index: v for v in sess.walk('IF-MIB::ifInDiscards')}
-    ifinerrors = {v.oid_index: v for v in sess.walk('IF-MIB::ifInErrors')}
-    ifoutdiscards = {
-        v.oid_index: v
-        for v in sess.walk('IF-MIB::ifOutDiscards')
-    }
-    ifouterrors = {v.oid_index: v for v in sess.walk('IF-MIB::ifOutErrors')}
-    for ifindex_row in ifindexes:
-        ifindex = ifindex_row.value
-        iface = {
-            'tags': {
-                'ifindex': int(ifindex),
-                'description': str_escape(ifdescr[ifindex].value),
-                'interface_type': int(iftypes[ifindex].value),
-                'speed': int(ifspeeds[ifindex].value),
-                'mtu': int(ifmtu[ifindex].value),
-                'uplink': is_uplink(ifdescr[ifindex].value)
-            },
-            'fields': {
-                'adminstatus': ifadminstatus[ifindex].value,
-                'operstatus': ifoperstatus[ifindex].value,
-                'bytes_in': ifinoctets[ifindex].value,
-                'ucast_pkts_in': ifinucastpkts[ifindex].value,
-                'multicast_pkts_in': ifinmcastpkts[ifindex].value,
-                'broadcast_pkts_in': ifinbcastpkts[ifindex].value,
-                'bytes_out': ifoutoctets[ifindex].value,
-                'ucast_pkts_out': ifoutucastpkts[ifindex].value,
-                'multicastcast_pkts_out': ifoutmcastpkts[ifindex].value,
-                'broadcast_pkts_out': ifoutbcastpkts[ifindex].value,
-                'discards_in': ifindiscards[ifindex].value,
-                'errors_in': ifinerrors[ifindex].value,
-                'discards_out': ifoutdiscards[ifindex].value,
-                'errors_out': ifouterrors[ifindex].value,
+    def active(self):
+        return any(x is not None for x in self.__dict__.values())
+
+    def match(self, descr, iftype, admin_status, oper_status):
+        if self.include_descr and not self.include_descr.search(descr):
+            return False
+        if self.exclude_descr and self.exclude_descr.search(descr):
+            return False
+        if self.include_types and iftype not in self.include_types:
+            return False
+        if self.exclude_types and iftype in self.exclude_types:
+            return False
+        if self.admin_status and admin_status not in self.admin_status:
+            return False
+        if self.oper_status and oper_status not in self.oper_status:
+            return False
+        return True
+
+
+def _array_counter(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return MISSING_COUNTER
+    return value if 0 <= value < MISSING_COUNTER else MISSING_COUNTER
+
+
+def _counter_array(column, indexes):
+    try:
+        # fast path, every row has a value that fits
+        return array('Q', map(int, map(column.__getitem__, indexes)))
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return array('Q', (_array_counter(column.get(i)) for i in indexes))
+
+
+class InterfaceTable():
+    """
+    Columnar stats of the interfaces of one device: one array per column
+    with the rows in ifIndex order, and the device tags formatted once.
+    print_influx_lines() serializes it row by row.
+    """
+    TAG_COLUMNS = [
+        ('interface_type', 'ifType'),
+        ('speed', 'ifSpeed'),
+        ('mtu', 'ifMtu'),
+    ]
+    FIELD_COLUMNS = [
+        ('adminstatus', 'ifAdminStatus'),
+        ('operstatus', 'ifOperStatus'),
+        ('bytes_in', 'ifHCInOctets'),
+        ('ucast_pkts_in', 'ifHCInUcastPkts'),
+        ('multicast_pkts_in', 'ifHCInMulticastPkts'),
+        ('broadcast_pkts_in', 'ifHCInBroadcastPkts'),
+        ('bytes_out', 'ifHCOutOctets'),
+        ('ucast_pkts_out', 'ifHCOutUcastPkts'),
+        ('multicastcast_pkts_out', 'ifHCOutMulticastPkts'),
+        ('broadcast_pkts_out', 'ifHCOutBroadcastPkts'),
+        ('discards_in', 'ifInDiscards'),
+        ('errors_in', 'ifInErrors'),
+        ('discards_out', 'ifOutDiscards'),
+        ('errors_out', 'ifOutErrors'),
+    ]
+
+    def __init__(self, table, basic_tags, uplink_ports=None, rates=None):
+        indexes = list(table['ifIndex'].values())
+        descrs = table['ifDescr']
+        self.ifindexes = array('q', (parse_int(i) for i in indexes))
+        self.descriptions = [str_escape(descrs.get(i, '')) for i in indexes]
+        self.uplinks = array(
+            'b', (is_uplink(descrs.get(i), uplink_ports) for i in indexes))
+        self.tags = {
+            name: array('q',
+                        (parse_int(table[column].get(i, ''))
+                         for i in indexes))
+            for name, column in self.TAG_COLUMNS
+        }
+        self.fields = {
+            name: _counter_array(table[column], indexes)
+            for name, column in self.FIELD_COLUMNS
+        }
+        self.rates = {}
+        if rates is not None:
+            rows = [rates.get(i) for i in indexes]
+            self.rates = {
+                'bps_in':
+                array('d', (r['ifHCInOctets'] * 8 if r else NAN
+                            for r in rows)),
+                'pps_in':
+                array('d', (r['ifHCInUcastPkts'] + r['ifHCInMulticastPkts'] +
+                            r['ifHCInBroadcastPkts'] if r else NAN
+                            for r in rows)),
+                'bps_out':
+                array('d', (r['ifHCOutOctets'] * 8 if r else NAN
+                            for r in rows)),
+                'pps_out':
+                array('d',
+                      (r['ifHCOutUcastPkts'] + r['ifHCOutMulticastPkts'] +
+                       r['ifHCOutBroadcastPkts'] if r else NAN
+                       for r in rows)),
             }
+        self.tag_suffix = "".join(",{}={}".format(k, v)
+                                  for k, v in basic_tags.items() if v != '')
+
+    def __len__(self):
+        return len(self.ifindexes)
+
+    def influx_lines(self, measurement):
+        field_names = ["{}=".format(name) for name in self.fields]
+        rate_names = ["{}=".format(name) for name in self.rates]
+        field_rows = zip(*self.fields.values())
+        rate_rows = zip(*self.rates.values()) if self.rates else None
+        for pos, description in enumerate(self.descriptions):
+            tags = [measurement, "ifindex={}".format(self.ifindexes[pos])]
+            if description != '':
+                tags.append("description={}".format(description))
+            for name, values in self.tags.items():
+                tags.append("{}={}".format(name, values[pos]))
+            tags.append("uplink={}".format(bool(self.uplinks[pos])))
+            fields = [
+                name + str(value)
+                for name, value in zip(field_names, next(field_rows))
+                if value != MISSING_COUNTER
+            ]
+            if rate_rows is not None:
+                fields.extend(
+                    name + repr(value)
+                    for name, value in zip(rate_names, next(rate_rows))
+                    if not math.isnan(value))
+            yield "{}{} {}".format(",".join(tags), self.tag_suffix,
+                                   ",".join(fields))
+
+
+def get_interfaces(sess,
+                   basic_tags,
+                   uplink_ports=None,
+                   cache=None,
+                   if_filter=None):
+    if if_filter is None or not if_filter.active():
+        table = fetch_table_cached(sess,
+                                   cache,
+                                   'interfaces',
+                                   IF_STATIC_COLUMNS,
+                                   IF_COLUMNS,
+                                   change_column='ifLastChange',
+                                   name='ifTable')
+    else:
+        # discover the interfaces with the cheap columns, then fetch the
+        # counters of the matching ones only
+        table = fetch_table_cached(sess,
+                                   cache,
+                                   'interfaces',
+                                   IF_STATIC_COLUMNS,
+                                   IF_DISCOVERY_COLUMNS,
+                                   change_column='ifLastChange',
+                                   name='ifTable_discovery')
+        selected = [
+            ifindex for ifindex in table['ifIndex'].values()
+            if if_filter.match(table['ifDescr'][ifindex],
+                               parse_int(table['ifType'][ifindex]),
+                               parse_int(table['ifAdminStatus'][ifindex]),
+                               parse_int(table['ifOperStatus'][ifindex]))
+        ]
+        table = {
+            label: {k: rows[k]
+                    for k in selected if k in rows}
+            for label, rows in table.items()
         }
-        iface['tags'].update(basic_tags)
-        interfaces.append(iface)
-    return interfaces
+        table.update(
+            fetch_rows(sess, IF_COUNTER_COLUMNS, selected, 'ifTable'))
+    rates = None
+    if emit_rates and cache is not None:
+        rates = counter_rates(cache, 'interfaces', table, IF_RATE_COUNTERS)
+    return InterfaceTable(table, basic_tags, uplink_ports, rates)
 
 
 def _convert_octetstr_to_mac(mac):
@@ -153,10 +826,8 @@ def _convert_octetstr_to_mac(mac):
 
 
 def _convert_oid_index_to_mac_ssid(oid_index):
-    mac = oid_index.split(".")[:-1]
-    ssid_index = int(oid_index.split(".")[-1])
-    mac = ":".join(format(int(x), '02X') for x in mac)
-    return (mac, ssid_index)
+    *mac, ssid_index = oid_index.split(".")
+    return (bytes(map(int, mac)).hex(':').upper(), int(ssid_index))
 
 
 def _convert_oid_index_to_mac(oid_index):
@@ -165,76 +836,124 @@ def _convert_oid_index_to_mac(oid_index):
 
 
 def _convert_oid_index_to_ssid(oid_index):
-    _, ssid = _convert_oid_index_to_mac_ssid(oid_index)
-    return ssid
+    return int(oid_index.rpartition(".")[2])
 
 
-def get_wireless(sess, basic_tags):
-    clients = sess.walk('MIKROTIK-MIB::mtxrWlCMRtabAddr')
-    dhcpclients = {
-        _convert_octetstr_to_mac(x.value):
-        ".".join(x.oid_index.split(".")[1:])
-        for x in sess.walk('IP-MIB::ipNetToMediaPhysAddress')
-    }
-    uptimes = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabUptime')
-    }
-    ssids = {
-        _convert_oid_index_to_ssid(x.oid_index): x.value
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabSsid')
-    }
-    txstr = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabTxStrength')
-    }
-    rxstr = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabRxStrength')
-    }
-    txbytes = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabTxBytes')
+def get_ssid_names(sess, ssid_ids, cache=None):
+    """
+    Map the SSID ids of the registered clients to SSID names, the names are
+    kept in the cache until a client shows up on an unknown SSID.
+    """
+    names = {}
+    if cache is not None:
+        names = {int(k): v for k, v in cache.get('ssids', {}).items()}
+    if not ssid_ids.issubset(names):
+        names = {
+            _convert_oid_index_to_ssid(k): v
+            for k, v in fetch_table(sess, WIRELESS_SSID_NAME_COLUMNS,
+                                    'mtxrWlCMRtabTable_ssid')
+            ['mtxrWlCMRtabSsid'].items()
+        }
+        if cache is not None:
+            cache['ssids'] = {str(k): v for k, v in names.items()}
+    return {k: v for k, v in names.items() if k in ssid_ids}
+
+
+def _arp_index_to_ip(oid_index):
+    # ifIndex.IP
+    return oid_index.partition(".")[2]
+
+
+def get_arp_addresses(sess, macs, cache=None):
+    """
+    Map the given MACs to their IP from the ARP table. The ARP table can
+    be large, with a cache its MAC to row index mapping is kept and only the
+    rows of the given MACs are fetched, to check they did not move. The
+    table is walked again when one did, at most every ARP_REFRESH seconds
+    when a new MAC is not in it, and every ARP_MISSING_REFRESH seconds for
+    the MACs the last walk did not find.
+    """
+    now = time.time()
+    arp = None
+    if cache is not None and 'arp' in cache:
+        arp = cache['arp']
+        rows = fetch_rows(sess, ARP_COLUMNS,
+                          [arp[mac] for mac in macs if mac in arp],
+                          'ipNetToMediaTable')['ipNetToMediaPhysAddress']
+        moved = any(
+            _convert_octetstr_to_mac(rows.get(arp[mac], '')) != mac
+            for mac in macs if mac in arp)
+        unknown = [mac for mac in macs if mac not in arp]
+        missing = set(cache.get('arp_missing', []))
+        age = now - cache['arp_ts']
+        if (moved or (age >= ARP_REFRESH and
+                      any(mac not in missing for mac in unknown))
+                or (unknown and age >= ARP_MISSING_REFRESH)):
+            arp = None
+    if arp is None:
+        arp = {
+            _convert_octetstr_to_mac(mac): oid_index
+            for oid_index, mac in fetch_table(sess, ARP_COLUMNS,
+                                              'ipNetToMediaTable')
+            ['ipNetToMediaPhysAddress'].items()
+        }
+        if cache is not None:
+            cache['arp'] = arp
+            cache['arp_ts'] = now
+            cache['arp_missing'] = [mac for mac in macs if mac not in arp]
+    return {mac: _arp_index_to_ip(arp[mac]) for mac in macs if mac in arp}
+
+
+def get_wireless(sess, basic_tags, cache=None):
+    table = fetch_table(sess, WIRELESS_CLIENT_COLUMNS + WIRELESS_SSID_COLUMNS,
+                        'mtxrWlCMRtabTable')
+    client_macs = {
+        clientindex: _convert_octetstr_to_mac(client_mac)
+        for clientindex, client_mac in table['mtxrWlCMRtabAddr'].items()
     }
-    rxbytes = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabRxBytes')
+    client_ssids = {
+        clientindex: _convert_oid_index_to_ssid(clientindex)
+        for clientindex in client_macs
     }
+    dhcpclients = get_arp_addresses(sess, set(client_macs.values()), cache)
+    uptimes = {k: int(v) for k, v in table['mtxrWlCMRtabUptime'].items()}
+    ssids = get_ssid_names(sess, set(client_ssids.values()), cache)
+    txstr = {k: int(v) for k, v in table['mtxrWlCMRtabTxStrength'].items()}
+    rxstr = {k: int(v) for k, v in table['mtxrWlCMRtabRxStrength'].items()}
+    txbytes = {k: int(v) for k, v in table['mtxrWlCMRtabTxBytes'].items()}
+    rxbytes = {k: int(v) for k, v in table['mtxrWlCMRtabRxBytes'].items()}
     txpackets = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabTxPackets')
+        k: int(v)
+        for k, v in table['mtxrWlCMRtabTxPackets'].items()
     }
     rxpackets = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabRxPackets')
-    }
-    txrate = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabTxRate')
-    }
-    rxrate = {
-        x.oid_index: int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRtabRxRate')
+        k: int(v)
+        for k, v in table['mtxrWlCMRtabRxPackets'].items()
     }
+    txrate = {k: int(v) for k, v in table['mtxrWlCMRtabTxRate'].items()}
+    rxrate = {k: int(v) for k, v in table['mtxrWlCMRtabRxRate'].items()}
     regclients = {
-        int(x.oid_index): int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMRegClientCount')
+        int(k): int(v)
+        for k, v in table['mtxrWlCMRegClientCount'].items()
     }
     authclients = {
-        int(x.oid_index): int(x.value)
-        for x in sess.walk('MIKROTIK-MIB::mtxrWlCMAuthClientCount')
+        int(k): int(v)
+        for k, v in table['mtxrWlCMAuthClientCount'].items()
     }
+    rates = {}
+    if emit_rates and cache is not None:
+        rates = counter_rates(cache, 'wireless', table,
+                              WIRELESS_RATE_COUNTERS)
     clients_ret = []
     ssid_ret = []
-    for client_row in clients:
-        clientindex = client_row.oid_index
-        mac = _convert_octetstr_to_mac(client_row.value)
+    for clientindex, mac in client_macs.items():
+        ssid_id = client_ssids[clientindex]
         ret = {
             'tags': {
                 'macaddress': mac,
                 'address': dhcpclients.get(mac, None),
-                'ssid_id': _convert_oid_index_to_ssid(clientindex),
-                'ssid': ssids[_convert_oid_index_to_ssid(clientindex)],
+                'ssid_id': ssid_id,
+                'ssid': ssids[ssid_id],
             },
             'fields': {
                 'txstrength': txstr[clientindex],
@@ -248,6 +967,14 @@ def get_wireless(sess, basic_tags):
                 'rxrate': rxrate[clientindex],
             }
         }
+        if clientindex in rates:
+            rate = rates[clientindex]
+            ret['fields'].update({
+                'txbps': rate['mtxrWlCMRtabTxBytes'] * 8,
+                'rxbps': rate['mtxrWlCMRtabRxBytes'] * 8,
+                'txpps': rate['mtxrWlCMRtabTxPackets'],
+                'rxpps': rate['mtxrWlCMRtabRxPackets'],
+            })
         ret['tags'].update(basic_tags)
         clients_ret.append(ret)
     for ssid_id, ssid_name in ssids.items():
@@ -266,11 +993,19 @@ def get_wireless(sess, basic_tags):
     return (clients_ret, ssid_ret)
 
 
-def get_env(sess, basic_tags):
+def get_env(sess, basic_tags, cache=None):
     env = []
+    health = fetch_scalars(sess, HEALTH_SCALARS, 'mtxrHealth')
+    health.update(fetch_table(sess, HEALTH_COLUMNS, 'mtxrHealth'))
+    storage = fetch_table_cached(sess,
+                                 cache,
+                                 'storage',
+                                 STORAGE_STATIC_COLUMNS,
+                                 STORAGE_COLUMNS,
+                                 name='hrStorageTable')
     cputemps = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlCpuTemperature")
+        int(k): float(v)
+        for k, v in health['mtxrHlCpuTemperature'].items()
     }
     for cpu_id, cputemp in cputemps.items():
         ret = {
@@ -284,8 +1019,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     boardtemps = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlBoardTemperature")
+        int(k): float(v)
+        for k, v in health['mtxrHlBoardTemperature'].items()
     }
     for board_id, boardtemp in boardtemps.items():
         ret = {
@@ -299,8 +1034,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     temp_sensors = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlTemperature")
+        int(k): float(v)
+        for k, v in health['mtxrHlTemperature'].items()
     }
     for sensor_id, temp_sensor in temp_sensors.items():
         ret = {
@@ -314,8 +1049,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     voltage_sensors = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlVoltage")
+        int(k): float(v)
+        for k, v in health['mtxrHlVoltage'].items()
     }
     for sensor_id, voltage_sensor in voltage_sensors.items():
         ret = {
@@ -329,8 +1064,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     fan_sensors = {
-        int(x.oid_index): x.value
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlActiveFan")
+        int(k): v
+        for k, v in health['mtxrHlActiveFan'].items()
     }
     for sensor_id, fan_sensor in fan_sensors.items():
         ret = {
@@ -344,8 +1079,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     cpu_freqs = {
-        int(x.oid_index): x.value
-        for x in sess.walk("MIKROTIK-MIB::mtxrHlProcessorFrequency")
+        int(k): v
+        for k, v in health['mtxrHlProcessorFrequency'].items()
     }
     for cpu_id, cpu_freq in cpu_freqs.items():
         ret = {
@@ -359,8 +1094,8 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     cpu_utils = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk(".1.3.6.1.2.1.25.3.3.1.2")
+        int(k): float(v)
+        for k, v in health['hrProcessorLoad'].items()
     }
     for cpu_id, cpu_util in cpu_utils.items():
         ret = {
@@ -374,28 +1109,28 @@ def get_env(sess, basic_tags):
         ret['tags'].update(basic_tags)
         env.append(ret)
     mem_types = {
-        int(x.oid_index): str(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageType")
+        int(k): str(v)
+        for k, v in storage['hrStorageType'].items()
     }
     mem_names = {
-        int(x.oid_index): str(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageDescr")
+        int(k): str(v)
+        for k, v in storage['hrStorageDescr'].items()
     }
     mem_units = {
-        int(x.oid_index): int(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageAllocationUnits")
+        int(k): int(v)
+        for k, v in storage['hrStorageAllocationUnits'].items()
     }
     mem_size = {
-        int(x.oid_index): int(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageSize")
+        int(k): int(v)
+        for k, v in storage['hrStorageSize'].items()
     }
     mem_used = {
-        int(x.oid_index): int(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageUsed")
+        int(k): int(v)
+        for k, v in storage['hrStorageUsed'].items()
     }
     mem_alloc_failures = {
-        int(x.oid_index): float(x.value)
-        for x in sess.walk("HOST-RESOURCES-MIB::hrStorageAllocationFailures")
+        int(k): float(v)
+        for k, v in storage['hrStorageAllocationFailures'].items()
     }
     for mem_id, mem_name in mem_names.items():
         ret = {
@@ -422,31 +1157,437 @@ def get_env(sess, basic_tags):
     return env
 
 
-def print_influx_lines(stats):
+def get_scrape_stats(stats, subsystem, duration, success, basic_tags):
+    """
+    mikrotik_scrape entries of one subsystem run: the totals, and one
+    entry per OID table fetched.
+    """
+    ret = []
+    total = dict(stats.total, duration=duration, success=success)
+    entries = [({}, total)] + [({
+        'table': table
+    }, counters) for table, counters in stats.tables.items()]
+    for tags, fields in entries:
+        entry = {
+            'tags': dict({'subsystem': subsystem}, **tags),
+            'fields': fields,
+        }
+        entry['tags'].update(basic_tags or {})
+        ret.append(entry)
+    return ret
+
+
+def influx_lines(stats):
+    """
+    Yield (measurement, line) for every entry of stats.
+    """
     for measurement, stat_a in stats.items():
-        measurement = "mikrotik_{}".format(measurement)
+        name = "mikrotik_{}".format(measurement)
+        if isinstance(stat_a, InterfaceTable):
+            for line in stat_a.influx_lines(name):
+                yield measurement, line
+            continue
         for stat in stat_a:
-            print("{},{} {}".format(
-                measurement, ",".join([
+            yield measurement, "{},{} {}".format(
+                name, ",".join([
                     "{}={}".format(k, v) for k, v in stat['tags'].items()
                     if v != ''
                 ]), ",".join([
                     "{}={}".format(k, v) for k, v in stat['fields'].items()
                     if v != ''
-                ])))
+                ]))
 
 
-def main():
+class ChangeFilter():
+    """
+    Suppresses the lines of interface and env series whose fields did not
+    change since they were last emitted. Every series is emitted at least
+    every heartbeat scrapes. The digests of the last emitted fields are
+    kept in cache['changes'], series which disappeared are forgotten.
+    """
+    MEASUREMENTS = ('interfaces', 'env')
+
+    def __init__(self, cache, heartbeat):
+        self.previous = cache.get('changes', {})
+        self.current = {}
+        self.heartbeat = heartbeat
+        cache['changes'] = self.current
+
+    def emit(self, measurement, line):
+        if measurement not in self.MEASUREMENTS:
+            return True
+        series, fields = FIELDS_SEPARATOR_REGEX.split(line, 1)
+        # env sensors of different kinds share their tags
+        series = _digest("{} {}".format(series,
+                                        FIELD_NAME_REGEX.findall(fields)))
+        fields = _digest(fields)
+        digest, skipped = self.previous.get(series, (None, 0))
+        if digest == fields and skipped + 1 < self.heartbeat:
+            self.current[series] = [fields, skipped + 1]
+            return False
+        self.current[series] = [fields, 0]
+        return True
+
+
+def _digest(string):
+    return hashlib.blake2b(string.encode(), digest_size=8).hexdigest()
+
+
+def print_influx_lines(stats, changes=None):
+    """
+    Print stats as influx lines, without the ones the ChangeFilter changes
+    suppresses.
+    """
+    for measurement, line in influx_lines(stats):
+        if changes is None or changes.emit(measurement, line):
+            print(line)
+
+
+def create_session(args):
+    # imported here, net-snmp reads the MIBs when easysnmp is imported and
+    # --numeric_oids has to disable that first
+    from easysnmp import Session, EasySNMPTimeoutError
+    if args.version == 2:
+        sess = Session(hostname=args.ip,
+                       community=args.community,
+                       version=args.version,
+                       timeout=args.timeout,
+                       retries=0,
+                       use_numeric=numeric_oids,
+                       use_long_names=numeric_oids,
+                       use_sprint_value=False)
+        return ScrapeSession(sess, args.retries, EasySNMPTimeoutError)
+    sess = Session(hostname=args.ip,
+                   version=args.version,
+                   auth_protocol=args.auth_protocol,
+                   auth_password=args.auth_password,
+                   security_username=args.username,
+                   privacy_protocol=args.privacy_protocol,
+                   privacy_password=args.privacy_password,
+                   security_level=args.security,
+                   timeout=args.timeout,
+                   retries=0,
+                   use_numeric=numeric_oids,
+                   use_long_names=numeric_oids,
+                   use_sprint_value=False)
+    return ScrapeSession(sess, args.retries, EasySNMPTimeoutError)
+
+
+class Device():
+    """
+    A polled device. Its subsystems (SUBSYSTEMS) are polled on their own
+    interval with their own SNMP session, so a slow subsystem does not hold
+    back the others; basic info runs first as it provides the tags and
+    validates the cache of the other subsystems.
+    """
+    def __init__(self, args):
+        self.args = args
+        self.ip = args.ip
+        self.intervals = {
+            'basic': args.interval_basic,
+            'interfaces': args.interval_interfaces,
+            'wireless': args.interval_wireless,
+            'env': args.interval_env,
+        }
+        self.if_filter = InterfaceFilter(
+            include_descr=args.include_descr,
+            exclude_descr=args.exclude_descr,
+            include_types=args.include_type,
+            exclude_types=args.exclude_type,
+            admin_status=args.admin_status,
+            oper_status=args.oper_status)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.running = set()
+        # outcome of the subsystems scheduled by the last scrape
+        self.status = {}
+        self.deadline = None
+        self.cache = None
+        self.cache_file = None
+        saved = {}
+        if args.cache_dir:
+            self.cache_file = join(args.cache_dir,
+                                   "mikrotik_{}.json".format(self.ip))
+            saved = self._load_cache()
+            self.cache = {
+                subsystem: saved.get(subsystem, {})
+                for subsystem in SUBSYSTEMS
+            }
+        elif args.execd:
+            self.cache = {subsystem: {} for subsystem in SUBSYSTEMS}
+        self.last_run = saved.get('last_run', {})
+        self.basic_tags = saved.get('basic', {}).get('tags')
+        # copy of what was last written to the cache file, each subsystem
+        # replaces its own part when it finishes
+        self.saved = saved
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_file) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, subsystem):
+        section = copy.deepcopy(self.cache[subsystem])
+        with self.lock:
+            self.saved[subsystem] = section
+            self.saved['last_run'] = dict(self.last_run)
+            tmp_file = "{}.tmp".format(self.cache_file)
+            with open(tmp_file, 'w') as f:
+                json.dump(self.saved, f)
+            os.replace(tmp_file, self.cache_file)
+
+    def _subsystem_cache(self, subsystem):
+        if self.cache is None:
+            return None
+        cache = self.cache[subsystem]
+        if subsystem != 'basic':
+            # drop the metadata cached before the device rebooted or its
+            # interface table changed, which changes on every scrape on a
+            # busy PPPoE concentrator: what is keyed by row is kept
+            epoch = self.cache['basic'].get('epoch', 0)
+            if cache.get('epoch') != epoch:
+                kept = {
+                    key: cache[key]
+                    for key in EPOCH_KEPT_KEYS + ['boot'] if key in cache
+                }
+                cache.clear()
+                cache.update(kept)
+                cache['epoch'] = epoch
+            # the counters restart from 0 after a reboot
+            boot = self.cache['basic'].get('boot', 0)
+            if cache.get('boot') != boot:
+                cache.pop('rates', None)
+                cache['boot'] = boot
+        return cache
+
+    def _due(self, subsystem, now):
+        """
+        Claim the subsystem for a run if its interval elapsed and it is not
+        still running from a previous scrape.
+        """
+        interval = self.intervals[subsystem] or 0
+        with self.lock:
+            if subsystem in self.running:
+                return False
+            if now - self.last_run.get(subsystem, 0) < interval * (
+                    1 - SCHEDULE_SLACK):
+                return False
+            self.running.add(subsystem)
+            self.last_run[subsystem] = now
+        return True
+
+    def _collect(self, subsystem, sess, cache):
+        if subsystem == 'basic':
+            basic = get_basic_info(sess, cache)
+            self.basic_tags = basic['tags']
+            if cache is not None:
+                cache['tags'] = basic['tags']
+            return {'basic': [basic]}
+        if subsystem == 'interfaces':
+            return {
+                'interfaces':
+                get_interfaces(sess, self.basic_tags, self.args.uplink_port,
+                               cache, self.if_filter)
+            }
+        if subsystem == 'wireless':
+            clients, ssids = get_wireless(sess, self.basic_tags, cache)
+            return {'wireless_clients': clients, 'wireless_basic': ssids}
+        return {'env': get_env(sess, self.basic_tags, cache)}
+
+    def run(self, subsystem):
+        """
+        Poll one subsystem and print its lines. Returns whether it
+        succeeded, a failure is reported on stderr. A subsystem cut by the
+        deadline is left skipped.
+        """
+        started = time.time()
+        sess = None
+        try:
+            if subsystem not in self.sessions:
+                self.sessions[subsystem] = create_session(self.args)
+            sess = self.sessions[subsystem]
+            sess.stats = ScrapeStats()
+            sess.deadline = self.deadline
+            cache = self._subsystem_cache(subsystem)
+            stats = self._collect(subsystem, sess, cache)
+            if self.args.scrape_stats:
+                stats['scrape'] = get_scrape_stats(sess.stats, subsystem,
+                                                   time.time() - started,
+                                                   True, self.basic_tags)
+            changes = None
+            if self.args.suppress_unchanged and cache is not None:
+                changes = ChangeFilter(cache, self.args.heartbeat)
+            emit(stats, changes)
+            self._set_status(subsystem, 'ok')
+            if self.cache_file is not None:
+                self._save_cache(subsystem)
+            return True
+        except DeadlineExceeded:
+            # not a connection failure, the session is kept; retry the
+            # subsystem on the next scrape
+            self._set_status(subsystem, 'skipped')
+            self._release([subsystem])
+            self._emit_failed_stats(sess, subsystem, started)
+            return False
+        except Exception as exc:
+            self._set_status(subsystem, 'failed')
+            # drop the session, the next scrape reconnects, and retry the
+            # subsystem on the next scrape
+            self.sessions.pop(subsystem, None)
+            self._release([subsystem])
+            print("mikrotik_stats: {}: {}: {}".format(self.ip, subsystem, exc),
+                  file=sys.stderr)
+            self._emit_failed_stats(sess, subsystem, started)
+            return False
+        finally:
+            with self.lock:
+                self.running.discard(subsystem)
+
+    def _emit_failed_stats(self, sess, subsystem, started):
+        if self.args.scrape_stats and sess is not None:
+            emit({
+                'scrape':
+                get_scrape_stats(sess.stats, subsystem,
+                                 time.time() - started, False,
+                                 self.basic_tags)
+            })
+
+    def schedule(self, executor, pending, deadline=None):
+        """
+        Submit the due subsystems to the executor and append their futures
+        to pending. Basic info runs before the others, which need its tags.
+        No request is sent after the deadline.
+        """
+        self.deadline = deadline
+        due = [s for s in SUBSYSTEMS if self._due(s, time.time())]
+        with self.lock:
+            self.status = {subsystem: 'skipped' for subsystem in due}
+        others = [s for s in due if s != 'basic']
+        if 'basic' in due:
+            pending.append(
+                executor.submit(self._run_basic_first, executor, pending,
+                                others))
+        elif self.basic_tags is None:
+            # basic info did not succeed yet, nothing could be tagged
+            self._release(others)
+        else:
+            self._submit(executor, pending, others)
+
+    def _run_basic_first(self, executor, pending, subsystems):
+        if self.run('basic') or self.basic_tags is not None:
+            self._submit(executor, pending, subsystems)
+        else:
+            self._release(subsystems)
+
+    def _submit(self, executor, pending, subsystems):
+        for subsystem in subsystems:
+            pending.append(executor.submit(self.run, subsystem))
+
+    def _set_status(self, subsystem, status):
+        with self.lock:
+            if subsystem in self.status:
+                self.status[subsystem] = status
+
+    def get_status(self):
+        """
+        mikrotik_status entry of the last scrape: the outcome of every
+        scheduled subsystem, skipped when it did not finish (in time).
+        """
+        with self.lock:
+            status = dict(self.status)
+        ret = {
+            'tags': {
+                'device': self.ip,
+            },
+            'fields': {
+                subsystem: "\"{}\"".format(value)
+                for subsystem, value in status.items()
+            }
+        }
+        ret['fields']['completed'] = sum(v == 'ok' for v in status.values())
+        ret['fields']['skipped'] = sum(v == 'skipped'
+                                       for v in status.values())
+        ret['tags'].update(self.basic_tags or {})
+        return ret
+
+    def _release(self, subsystems):
+        with self.lock:
+            for subsystem in subsystems:
+                self.running.discard(subsystem)
+                self.last_run.pop(subsystem, None)
+
+
+def emit(stats, changes=None):
+    with output_lock:
+        print_influx_lines(stats, changes)
+        sys.stdout.flush()
+
+
+def scrape_devices(devices, executor, wait=True, deadline=None):
+    """
+    Schedule the due subsystems of every device on the executor, each
+    subsystem prints its lines as soon as it is done. With wait, return
+    when every scheduled subsystem finished or the deadline passed.
+    Returns whether everything finished.
+    """
+    pending = []
+    for device in devices:
+        device.schedule(executor, pending, deadline)
+    while wait and pending:
+        # a finished basic info run appends the subsystems it started
+        future = pending.pop()
+        try:
+            future.result(timeout=None if deadline is None else max(
+                0, deadline - time.time()))
+        except FutureTimeoutError:
+            pending.append(future)
+            break
+    return not pending
+
+
+def run_execd(devices, executor, deadline=None):
+    """
+    telegraf inputs.execd loop (signal = "STDIN"): every line received on
+    stdin triggers one scrape, the devices and their SNMP sessions are kept
+    between scrapes. A subsystem still running from the previous trigger is
+    skipped instead of waited for. With a deadline (seconds), a subsystem
+    stops sending requests that long after the trigger, and the
+    mikrotik_status lines of the trigger are printed then.
+    Returns when telegraf closes stdin.
+    """
+    for _ in sys.stdin:
+        if deadline is None:
+            scrape_devices(devices, executor, wait=False)
+            continue
+        # wait for the trigger's subsystems in the background, the next
+        # trigger must not be held back by a slow one
+        threading.Thread(target=scrape_and_report,
+                         args=(devices, executor, time.time() + deadline),
+                         daemon=True).start()
+
+
+def scrape_and_report(devices, executor, deadline):
+    """
+    Scrape the devices and print their mikrotik_status lines once every
+    subsystem finished or the deadline passed.
+    """
+    scrape_devices(devices, executor, deadline=deadline)
+    emit({'status': [device.get_status() for device in devices]})
+
+
+def build_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("ip",
-                        help="IP address of the network device",
-                        type=str)
+                        help="IP address of the network device(s)",
+                        type=str,
+                        nargs="*")
     parser.add_argument("-v",
                         "--version",
                         type=int,
                         help="SNMP protocol version",
-                        choices=[2, 3],
-                        required=True)
+                        choices=[2, 3])
     parser.add_argument("-c", "--community", type=str, help="Community string")
     parser.add_argument("-s",
                         "--security",
@@ -480,31 +1621,208 @@ def main():
                         type=str,
                         help="Tag the matching port with uplink tag",
                         nargs="+")
+    parser.add_argument("--include_descr",
+                        type=str,
+                        help="Only poll interfaces whose ifDescr matches "
+                        "this regex")
+    parser.add_argument("--exclude_descr",
+                        type=str,
+                        help="Do not poll interfaces whose ifDescr matches "
+                        "this regex")
+    parser.add_argument("--include_type",
+                        type=int,
+                        help="Only poll interfaces of this ifType, repeat "
+                        "for several",
+                        action="append")
+    parser.add_argument("--exclude_type",
+                        type=int,
+                        help="Do not poll interfaces of this ifType, repeat "
+                        "for several",
+                        action="append")
+    parser.add_argument("--admin_status",
+                        type=int,
+                        help="Only poll interfaces with this ifAdminStatus, "
+                        "repeat for several",
+                        action="append")
+    parser.add_argument("--oper_status",
+                        type=int,
+                        help="Only poll interfaces with this ifOperStatus, "
+                        "repeat for several",
+                        action="append")
+    parser.add_argument("-r",
+                        "--max_repetitions",
+                        type=int,
+                        default=DEFAULT_MAX_REPETITIONS,
+                        help="GETBULK max-repetitions for table fetches, "
+                        "0 walks every column with GETNEXT")
+    parser.add_argument("--columns_per_pdu",
+                        type=int,
+                        default=DEFAULT_COLUMNS_PER_PDU,
+                        help="Number of table columns fetched in one GETBULK")
+    parser.add_argument("-t",
+                        "--timeout",
+                        type=float,
+                        default=DEFAULT_TIMEOUT,
+                        help="SNMP request timeout in seconds")
+    parser.add_argument("--retries",
+                        type=int,
+                        default=DEFAULT_RETRIES,
+                        help="SNMP request retries")
+    parser.add_argument("-f",
+                        "--devices",
+                        type=str,
+                        help="File with one device per line, given as "
+                        "'IP [options]' with the same options as the command "
+                        "line; options not set on the line are inherited")
+    parser.add_argument("-w",
+                        "--workers",
+                        type=int,
+                        default=DEFAULT_WORKERS,
+                        help="Number of subsystem tasks, of all devices, "
+                        "scraped concurrently")
+    parser.add_argument("-n",
+                        "--numeric_oids",
+                        action="store_true",
+                        help="Request numeric OIDs from the built-in table "
+                        "and do not load any MIB file")
+    parser.add_argument("--cache_dir",
+                        type=str,
+                        help="Directory to keep the static interface, "
+                        "storage and SSID metadata of each device between "
+                        "runs, so only counters are polled")
+    parser.add_argument("--rates",
+                        action="store_true",
+                        help="Add bits and packets per second fields "
+                        "computed from the previous sample of the counters, "
+                        "needs --cache_dir or --execd")
+    parser.add_argument("--suppress_unchanged",
+                        action="store_true",
+                        help="Only print the interface and env lines whose "
+                        "fields changed since they were last printed, needs "
+                        "--cache_dir or --execd")
+    parser.add_argument("--heartbeat",
+                        type=int,
+                        default=DEFAULT_HEARTBEAT,
+                        help="With --suppress_unchanged, print every line at "
+                        "least every that many scrapes")
+    for subsystem in SUBSYSTEMS:
+        parser.add_argument("--interval_{}".format(subsystem),
+                            type=float,
+                            default=0,
+                            help="Poll {} at most every that many seconds, "
+                            "0 polls it on every scrape, needs --cache_dir "
+                            "or --execd".format(subsystem))
+    parser.add_argument("--scrape_stats",
+                        action="store_true",
+                        help="Add a mikrotik_scrape measurement with the "
+                        "duration, requests, varbinds, retries, timeouts "
+                        "and received bytes of every subsystem and table")
+    parser.add_argument("--deadline",
+                        type=float,
+                        help="Time budget of a scrape in seconds, set it "
+                        "below the telegraf timeout: what finished by then is "
+                        "printed, with a mikrotik_status line per device "
+                        "telling which subsystems were skipped")
+    parser.add_argument("--execd",
+                        action="store_true",
+                        help="Run as a telegraf inputs.execd daemon, "
+                        "scraping every time a line is read from stdin")
+    return parser
+
+
+# options applying to the whole process, which a device file line can not
+# change
+PROCESS_OPTIONS = [
+    ('max_repetitions', '--max_repetitions'),
+    ('columns_per_pdu', '--columns_per_pdu'),
+    ('workers', '--workers'),
+    ('numeric_oids', '--numeric_oids'),
+    ('rates', '--rates'),
+    ('devices', '--devices'),
+    ('deadline', '--deadline'),
+    ('execd', '--execd'),
+]
+
+
+def load_devices(parser, args):
+    device_args = []
+    for ip in args.ip:
+        device_args.append(argparse.Namespace(**dict(vars(args), ip=ip)))
+    if args.devices:
+        with open(args.devices) as f:
+            for line in f:
+                line = line.strip()
+                if line == "" or line.startswith("#"):
+                    continue
+                line_args = parser.parse_args(
+                    shlex.split(line), namespace=copy.copy(args))
+                if len(line_args.ip) != 1:
+                    parser.error("{}: expected exactly one IP per line, "
+                                 "got '{}'".format(args.devices, line))
+                for dest, option in PROCESS_OPTIONS:
+                    if getattr(line_args, dest) != getattr(args, dest):
+                        parser.error("{}: {} applies to every device, pass "
+                                     "it on the command line, got '{}'".format(
+                                         args.devices, option, line))
+                line_args.ip = line_args.ip[0]
+                device_args.append(line_args)
+    if len(device_args) == 0:
+        parser.error("no device given, pass an IP or --devices")
+    for device_arg in device_args:
+        if device_arg.version is None:
+            parser.error("{}: the SNMP version (-v) is required".format(
+                device_arg.ip))
+        if device_arg.cache_dir or device_arg.execd:
+            continue
+        if device_arg.rates:
+            parser.error("{}: --rates needs --cache_dir or --execd to keep "
+                         "the previous samples".format(device_arg.ip))
+        if device_arg.suppress_unchanged:
+            parser.error("{}: --suppress_unchanged needs --cache_dir or "
+                         "--execd to keep the last printed values".format(
+                             device_arg.ip))
+        for subsystem in SUBSYSTEMS:
+            if getattr(device_arg, "interval_{}".format(subsystem)):
+                parser.error("{}: --interval_{} needs --cache_dir or --execd "
+                             "to keep the last poll times".format(
+                                 device_arg.ip, subsystem))
+    return [Device(device_arg) for device_arg in device_args]
+
+
+def main():
+    started = time.time()
+    parser = build_parser()
     args = parser.parse_args()
-    global uplinks
+    global uplinks, max_repetitions, columns_per_pdu, numeric_oids
+    global emit_rates
     uplinks = args.uplink_port
-    if args.version == 2:
-        snmp_sess = Session(hostname=args.ip,
-                            community=args.community,
-                            version=args.version,
-                            use_sprint_value=False)
-    else:
-        snmp_sess = Session(hostname=args.ip,
-                            version=args.version,
-                            auth_protocol=args.auth_protocol,
-                            auth_password=args.auth_password,
-                            security_username=args.username,
-                            privacy_protocol=args.privacy_protocol,
-                            privacy_password=args.privacy_password,
-                            security_level=args.security,
-                            use_sprint_value=False)
-    stats = {}
-    stats['basic'] = [get_basic_info(snmp_sess)]
-    stats['interfaces'] = get_interfaces(snmp_sess, stats['basic'][0]['tags'])
-    stats['wireless_clients'], stats['wireless_basic'] = get_wireless(
-        snmp_sess, stats['basic'][0]['tags'])
-    stats['env'] = get_env(snmp_sess, stats['basic'][0]['tags'])
-    print_influx_lines(stats)
+    max_repetitions = args.max_repetitions
+    columns_per_pdu = max(1, args.columns_per_pdu)
+    numeric_oids = args.numeric_oids
+    emit_rates = args.rates
+    if numeric_oids:
+        # an empty MIB list and search path keep net-snmp from reading MIBs
+        os.environ['MIBS'] = ''
+        os.environ['MIBDIRS'] = ''
+    deadline = None
+    if args.deadline is not None:
+        deadline = started + args.deadline
+    devices = load_devices(parser, args)
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        if args.execd:
+            run_execd(devices, executor, args.deadline)
+            return
+        finished = scrape_devices(devices, executor, deadline=deadline)
+        if deadline is None:
+            return
+        with output_lock:
+            print_influx_lines(
+                {'status': [device.get_status() for device in devices]})
+            sys.stdout.flush()
+            if not finished:
+                # do not wait for the subsystems still running, the lines
+                # they would print come too late
+                os._exit(0)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# mikrotik_stats.py Device runs against a simulated device
+# (bench/snmpsim.py), with its cache kept in a temporary dir.
+#
+# python3 -m pytest tests
+#
+import contextlib
+import io
+import sys
+import tempfile
+import time
+import unittest
+from os.path import abspath, dirname, join
+
+sys.path.insert(0, join(dirname(abspath(__file__)), '..', 'bench'))
+import mikrotik_stats  # noqa: E402
+from snmpsim import SimulatedAgent, SimulatedSession  # noqa: E402
+from snmpsim import SimulatedTimeout, oid_key  # noqa: E402
+
+
+def set_value(agent, name, value):
+    key = oid_key("{}.0".format(mikrotik_stats.NUMERIC_OIDS[name]))
+    snmp_type, _ = agent.get(key)
+    agent.values[agent.index[key]] = (snmp_type, str(value))
+
+
+class DeviceCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.agent = SimulatedAgent.synthetic(interfaces=10)
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.create_session = mikrotik_stats.create_session
+        self.emit_rates = mikrotik_stats.emit_rates
+        mikrotik_stats.create_session = lambda args: (
+            mikrotik_stats.ScrapeSession(SimulatedSession(self.agent), 0,
+                                         SimulatedTimeout))
+
+    def tearDown(self):
+        mikrotik_stats.create_session = self.create_session
+        mikrotik_stats.emit_rates = self.emit_rates
+        self.cache_dir.cleanup()
+
+    def device(self, *options):
+        args = mikrotik_stats.build_parser().parse_args(
+            ['-v', '2', '-c', 'public', '--cache_dir', self.cache_dir.name] +
+            list(options) + ['10.0.0.1'])
+        args.ip = args.ip[0]
+        mikrotik_stats.emit_rates = args.rates
+        return mikrotik_stats.Device(args)
+
+    def scrape(self, device):
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            for subsystem in ('basic', 'interfaces'):
+                self.assertTrue(device.run(subsystem))
+        return out.getvalue()
+
+    def test_rates_survive_interface_table_change(self):
+        device = self.device('--rates')
+        self.assertNotIn('bps_in=', self.scrape(device))
+        set_value(self.agent, 'ifTableLastChange', 1300)
+        self.assertEqual(self.scrape(device).count('bps_in='), 10)
+
+    def test_rates_dropped_after_reboot(self):
+        device = self.device('--rates')
+        self.scrape(device)
+        set_value(self.agent, 'sysUpTime', 100)
+        self.assertNotIn('bps_in=', self.scrape(device))
+        self.assertEqual(self.scrape(device).count('bps_in='), 10)
+
+    def test_suppression_survives_interface_table_change(self):
+        device = self.device('--suppress_unchanged')
+        self.assertIn('mikrotik_interfaces,', self.scrape(device))
+        set_value(self.agent, 'ifTableLastChange', 1300)
+        self.assertNotIn('mikrotik_interfaces,', self.scrape(device))
+
+    def test_deadline_skips_and_keeps_session(self):
+        device = self.device()
+        self.scrape(device)
+        session = device.sessions['interfaces']
+        device.status = {'interfaces': 'skipped'}
+        device.deadline = time.time() - 1
+        self.assertFalse(device.run('interfaces'))
+        self.assertEqual(device.status['interfaces'], 'skipped')
+        self.assertIs(device.sessions['interfaces'], session)
+
+
+if __name__ == "__main__":
+    unittest.main()